@@ -2,7 +2,7 @@ import os
 import json
 from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import Dict, Literal, Optional
 
 class Settings(BaseSettings):
     """
@@ -10,9 +10,66 @@ class Settings(BaseSettings):
     Utilizes the BaseSettings from pydantic for environment variables.
     """
 
+    # Inference executor : run preprocessing and CatBoost off the event loop
+    inference_executor_enabled: bool = True
+    inference_executor_workers: int = 2
+    inference_thread_count: int = -1
+    # Engine evaluating the trees : "catboost" or "numpy"
+    inference_backend: str = "catboost"
+
+    # Startup : "eager" loads the models when the app is imported, "lazy" in the background once the server is up
+    startup_mode: Literal["eager", "lazy"] = "eager"
+
+    # Model registry : versions listed in the manifest, warmed up before serving, reloaded when it changes (0 s disables polling)
+    model_manifest_path: str = "models/UNSW_NB15_models/manifest.json"
+    model_warmup_rows: int = 256
+    model_reload_poll_s: float = 10.0
+
+    # /predict-all : classify only the rows flagged by the detection model, optionally from a probability threshold
+    predict_all_cascade: bool = True
+    predict_all_threshold: Optional[float] = None
+
+    # Micro-batching : score rows of concurrent requests in one model call, with a bounded number of requests waiting
+    batching_enabled: bool = False
+    batching_max_batch_rows: int = 4096
+    batching_max_wait_ms: float = 5.0
+    batching_max_queued: int = 1024
+
+    # Prediction cache : reuse the predictions of rows already scored
+    prediction_cache_enabled: bool = False
+    prediction_cache_max_entries: int = 100000
+    prediction_cache_ttl_s: float = 300.0
+
+    # Prometheus metrics : per-stage latencies, rows and request counters on /metrics
+    metrics_enabled: bool = True
+
+    # Streaming ingestion : maximum number of uploaded rows decoded and scored at once
+    streaming_batch_rows: int = 65536
+
+    # Connection counts : compute the ct_* windowed counts of the uploads from their raw addresses, ports and service,
+    # one stream per worker in arrival order, instead of expecting them from the client
+    connection_counts_enabled: bool = False
+
+    # Admission control : concurrent requests per endpoint (overridable per path), rows allowed to wait,
+    # and the estimated queue delay beyond which requests are rejected with 429
+    admission_enabled: bool = False
+    admission_max_concurrency: int = 4
+    admission_endpoint_concurrency: Dict[str, int] = {}
+    admission_max_queue_rows: int = 500000
+    admission_deadline_s: float = 2.0
+
+    # Logging : "queue" formats and writes on a background thread, DEBUG records can be sampled (1.0 keeps all)
+    log_mode: Literal["sync", "queue"] = "sync"
+    log_format: Literal["color", "json"] = "color"
+    log_level: str = "DEBUG"
+    log_queue_size: int = 10000
+    log_debug_sample_rate: float = 1.0
+
     class Config:
         env_file = ".env"
         extra = "ignore"
+        # Allow the model_* settings, pydantic reserves that prefix by default
+        protected_namespaces = ("settings_",)
 
 
 @lru_cache(maxsize=None)
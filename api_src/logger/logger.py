@@ -1,8 +1,15 @@
+import atexit
 import functools
 import logging
+import os
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from pythonjsonlogger import jsonlogger
 from uvicorn.logging import ColourizedFormatter
 from typing import Any, Callable
+from api_src.config.settings import get_settings
 
 # Custom colorized formatter to apply colors specifically to log levels
 class CustomColourizedFormatter(ColourizedFormatter):
@@ -25,6 +32,117 @@ class CustomColourizedFormatter(ColourizedFormatter):
         # Format the log message using the parent class's format method
         return super().format(record)
 
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records, for hot-path logs.
+
+    The fraction is the `sample_rate` given with the record (`extra={"sample_rate": 0.01}`),
+    else `debug_sample_rate` for DEBUG records. Kept records carry their rate, so counts
+    can be scaled back.
+    """
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno != logging.DEBUG or self.debug_sample_rate >= 1.0:
+                return True
+            rate = record.sample_rate = self.debug_sample_rate
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands the records to the listener thread without formatting them or ever waiting.
+
+    The message is built from its arguments by the listener, so arguments must not be
+    mutated after the call. When the queue is full the record is dropped and counted.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in this process, the listener formats them as they are
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def _output_handler(settings) -> logging.Handler:
+    """The handler formatting and writing the records to stdout."""
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        formatter = jsonlogger.JsonFormatter(
+            "%(asctime)s %(levelname)s %(name)s %(process)d %(message)s",
+            rename_fields={"asctime": "time", "levelname": "level", "name": "logger", "process": "pid"},
+        )
+    else:
+        # Create a custom formatter with colored log levels
+        formatter = CustomColourizedFormatter(
+            "{asctime} | {levelname:<8} | {message}",
+            style="{",
+            datefmt="%Y-%m-%d %H:%M:%S",
+            use_colors=True
+        )
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _start_listener() -> None:
+    global _listener
+    _handler.queue = queue.Queue(get_settings().log_queue_size)
+    _listener = QueueListener(_handler.queue, _output_handler(get_settings()), respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Write the records still queued and stop the listener thread, in queue mode.
+
+    Called at exit, and by processes leaving through os._exit, which skips it.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    try:
+        listener.stop()
+    except queue.Full:
+        # No room for the stop sentinel : the records left are dropped
+        pass
+    if _handler.dropped:
+        sys.stdout.write(f"{_handler.dropped} log records dropped, the log queue was full\n")
+
+
+def _get_handler() -> logging.Handler:
+    """The handler shared by every logger of the process, created on first use."""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    settings = get_settings()
+    if settings.log_mode == "queue":
+        # Formatting and I/O run on a listener thread, logging calls only enqueue
+        _handler = NonBlockingQueueHandler(queue.Queue(settings.log_queue_size))
+        _start_listener()
+        atexit.register(stop_logging)
+        # The listener thread does not survive a fork (serve.py workers) : start one in the child,
+        # on a new queue as the parent's may have been locked mid-operation
+        os.register_at_fork(after_in_child=_start_listener)
+    else:
+        _handler = _output_handler(settings)
+    _handler.addFilter(SamplingFilter(settings.log_debug_sample_rate))
+    return _handler
+
+
 def get_logger(name: str) -> logging.Logger:
     """Creates a logger object
 
@@ -36,29 +154,36 @@ def get_logger(name: str) -> logging.Logger:
     """
     # Create logger
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(get_settings().log_level.upper())
 
     # Prevent adding multiple handlers if already exists
     if not logger.hasHandlers():
-        # Create console handler and set level to debug
-        ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(logging.DEBUG)
+        # One handler for the process : stdout, or the queue of the listener thread
+        logger.addHandler(_get_handler())
 
-        # Create a custom formatter with colored log levels
-        formatter = CustomColourizedFormatter(
-            "{asctime} | {levelname:<8} | {message}",
-            style="{",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            use_colors=True
-        )
+    return logger
 
-        # Add formatter to the handler
-        ch.setFormatter(formatter)
 
-        # Add handler to the logger
-        logger.addHandler(ch)
+def _summary(value: Any) -> str:
+    """Short description of a value : shape of arrays and dataframes, bounded repr otherwise."""
+    shape = getattr(value, "shape", None)
+    if shape is not None:
+        return f"{type(value).__name__}(shape={tuple(shape)})"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key!r}: {_summary(item)}" for key, item in value.items()) + "}"
+    if isinstance(value, (list, tuple)) and len(value) <= 10:
+        return "(" + ", ".join(_summary(item) for item in value) + ")"
+    text = repr(value)
+    return text if len(text) <= 200 else text[:200] + "..."
 
-    return logger
+
+class _LazySummary:
+    """Summarizes its values only when a handler formats the record."""
+    def __init__(self, *values: Any):
+        self.values = values
+
+    def __str__(self) -> str:
+        return ", ".join(_summary(value) for value in self.values)
 
 # Logger decorator implementation
 def log_function_call(logger: logging.Logger) -> Callable:
@@ -73,11 +198,13 @@ def log_function_call(logger: logging.Logger) -> Callable:
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            # Log the function call with arguments
-            logger.debug(f"Calling {func.__name__} with args: {args} and kwargs: {kwargs}")
+            # Nothing is formatted unless DEBUG is enabled, dataframes and arrays are summarized by shape
+            enabled = logger.isEnabledFor(logging.DEBUG)
+            if enabled:
+                logger.debug("Calling %s with args: %s and kwargs: %s", func.__name__, _LazySummary(*args), _LazySummary(kwargs))
             result = func(*args, **kwargs)
-            # Log the function result
-            logger.debug(f"{func.__name__} returned {result}")
+            if enabled:
+                logger.debug("%s returned %s", func.__name__, _LazySummary(result))
             return result
         return wrapper
     return decorator
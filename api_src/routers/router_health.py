@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from api_src.services.startup import get_startup_state
+
+
+router = APIRouter()
+
+
+@router.get(path="/healthz")
+async def healthz():
+    # Liveness : the process serves requests, whether the models are loaded or not
+    return {"status": "alive"}
+
+
+@router.get(path="/readyz")
+async def readyz():
+    # Readiness : the models are loaded and warmed up, the prediction endpoints can take traffic
+    state = get_startup_state()
+    body = {"status": state.status, "timings_ms": state.timings_ms}
+    if state.error is not None:
+        body["error"] = state.error
+    return JSONResponse(body, status_code=200 if state.status == "ready" else 503)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from api_src.services.metrics import metrics_response
+
+
+router = APIRouter()
+
+
+@router.get(path="/metrics")
+async def metrics():
+    # Prometheus scrape endpoint, aggregated over the workers in multiprocess mode
+    return metrics_response()
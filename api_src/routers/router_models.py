@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException
+from api_src.logger.logger import get_logger
+from api_src.services.registry import get_model_registry, reload_models
+from api_src.services.startup import get_startup_state
+
+logger = get_logger(__file__)
+router = APIRouter()
+
+
+def _loaded_registry():
+    # In lazy startup mode the models may still be loading, don't load them on the event loop
+    if get_startup_state().status != "ready" :
+        raise HTTPException(status_code=503 , detail="Models are not loaded yet.")
+    return get_model_registry()
+
+
+@router.get(path="/models")
+async def models():
+    # Versions served by this worker, and the replaced ones still finishing calls
+    return _loaded_registry().status()
+
+
+@router.post(path="/models/reload")
+async def reload():
+    # Load the manifest's active versions in this worker now, instead of at the next poll
+    registry = _loaded_registry()
+    try :
+        swapped = await reload_models(registry)
+    except Exception as e :
+        logger.error(f"Failed to reload the models.{e}")
+        raise HTTPException(status_code=500 , detail=f"Failed to reload the models, still serving {registry.active.versions}.")
+    return {"swapped": swapped, **registry.status()}
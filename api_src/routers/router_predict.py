@@ -1,116 +1,144 @@
-from fastapi import APIRouter
 from api_src.logger.logger import get_logger
 from api_src.config.settings import get_settings
 from api_src.schemas.schema_predict import PredictAllRequest , PredictAttackRequest , PredictAttackCatRequest
-from fastapi import UploadFile, File
-from fastapi import APIRouter, HTTPException
-import pandas as pd
-from io import BytesIO
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Header
 from api_src.services.service_predict import ServicePredict
-from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
 import numpy as np 
 from api_src.services.service_predict_cat import ServicePredictCat
-from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
-detection_model = DetectionModel()
-detection_service_instance = ServicePredict(model = detection_model)
-classification_model = ClassificationModel()
-classification_service_instance = ServicePredictCat(model = classification_model)
+from api_src.services.service_predict_all import ServicePredictAll
+from api_src.services.registry import get_model_registry
+from api_src.services.streaming import open_parquet, apredict_stream, ndjson_response, get_connection_counter
+from api_src.services.executor import run_inference
+from api_src.services.serializer import negotiate, serialize, to_jsonable
+from api_src.services.admission import AdmissionRejected, admit, get_admission_controllers
+settings = get_settings()
+# The registry loads the manifest's active versions and swaps in new ones on reload
+model_registry = get_model_registry()
+detection_service_instance = ServicePredict(registry = model_registry)
+classification_service_instance = ServicePredictCat(registry = model_registry)
+combined_service_instance = ServicePredictAll(registry = model_registry)
+# Fills in the ct_* counts of the uploads when they are computed server-side, None otherwise
+connection_counter = get_connection_counter()
 
 
 logger = get_logger(__file__)
-settings = get_settings()
 router = APIRouter()
 
 
+def _format_all(result) :
+    preds, preds_cat = result
+    return [pred_cat * pred for pred , pred_cat in zip(to_jsonable(preds) , to_jsonable(preds_cat))]
+
+async def _admit(endpoint, parquet_file) :
+    # Wait for a slot of the endpoint, or shed the request before any row is decoded
+    try :
+        return await admit(endpoint, parquet_file.metadata.num_rows)
+    except AdmissionRejected as e :
+        parquet_file.close(force=True)
+        raise HTTPException(status_code=429 , detail=f"Server overloaded ({e.reason}), retry later." , headers={"Retry-After": str(e.retry_after_s)})
+
+def _attack_categories(result) :
+    # Attack category of the flows detected as attacks, empty for normal flows
+    preds, preds_cat = result
+    return np.where(preds.reshape(-1, 1) != 0, preds_cat, "")
+
+
 
 @router.post(path="/predict-all")
-async def predict_all(file: UploadFile = File(...)): 
-    content = await file.read()
-    parquet_buffer = BytesIO(content)
+async def predict_all(file: UploadFile = File(...), stream: bool = False, accept: Optional[str] = Header(None)): 
+    media_type = negotiate(accept)
 
+    # The upload is decoded row group by row group, and only the columns the models read
+    plan = combined_service_instance.plan
     try :
-        features = pd.read_parquet(parquet_buffer)
+        parquet_file = await run_inference(open_parquet, file, detach=stream, plan=plan, counter=connection_counter)
+    except HTTPException :
+        raise
     except Exception as e :
         logger.error(f"Failed to read Parquet file.{e}")
         raise HTTPException(status_code=400 , detail="Failed to read Parquet file.")
 
-    try :
-        preds = await detection_service_instance.apredict_detection(features)
-        
-        # Ensure preds is in JSON-compatible format
-        if isinstance(preds, pd.DataFrame):
-            preds = preds.to_dict(orient="records")  # Convert DataFrame to a list of dictionaries
-        elif isinstance(preds, np.ndarray):
-            preds = preds.tolist()  # Convert numpy array to list
-        elif isinstance(preds, dict):
-            preds = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in preds.items()}
-
-        preds_cat = await classification_service_instance.apredict_classification(features)
-        
-        # Ensure preds is in JSON-compatible format
-        if isinstance(preds_cat, pd.DataFrame):
-            preds_cat = preds_cat.to_dict(orient="records")
-
-        elif isinstance(preds_cat, np.ndarray):
-            preds_cat = preds_cat.tolist()
-
-        elif isinstance(preds_cat, dict):
-            preds_cat = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in preds_cat.items()}
+    lease = await _admit("/predict-all", parquet_file)
+    if stream :
+        # Emit one NDJSON line per scored chunk, the slot is held until the last one
+        return ndjson_response(parquet_file, combined_service_instance.apredict_all, settings.streaming_batch_rows, _format_all, plan, on_close=lease.release, counter=connection_counter)
 
-
-        return [pred_cat * pred for pred , pred_cat in zip(preds , preds_cat)]
+    try :
+        # Preprocess once and feed both models
+        result = await apredict_stream(parquet_file, combined_service_instance.apredict_all, settings.streaming_batch_rows, plan, counter=connection_counter)
+        return serialize(lambda: _attack_categories(result), media_type, lambda: _format_all(result), name="attack_cat")
 
     except Exception as e :
         logger.error(f"Prediction failed.{e}")
+    finally :
+        lease.release()
 
 @router.post(path="/predict-attack-cat" ) 
-async def predict_attack_cat(file : UploadFile = File(...)) : 
-    content = await file.read()
-    parquet_buffer = BytesIO(content)
+async def predict_attack_cat(file : UploadFile = File(...), stream : bool = False, accept : Optional[str] = Header(None)) : 
+    media_type = negotiate(accept)
 
+    # The upload is decoded row group by row group, and only the columns the model reads
+    plan = classification_service_instance.plan
     try :
-        features = pd.read_parquet(parquet_buffer)
+        parquet_file = await run_inference(open_parquet, file, detach=stream, plan=plan, counter=connection_counter)
+    except HTTPException :
+        raise
     except Exception as e :
         raise HTTPException(status_code=400 , detail="Failed to read Parquet file.")
 
+    lease = await _admit("/predict-attack-cat", parquet_file)
+    if stream :
+        # Emit one NDJSON line per scored chunk, the slot is held until the last one
+        return ndjson_response(parquet_file, classification_service_instance.apredict_classification, settings.streaming_batch_rows, to_jsonable, plan, on_close=lease.release, counter=connection_counter)
+
     try :
-        preds = await classification_service_instance.apredict_classification(features)
-        
-        # Ensure preds is in JSON-compatible format
-        if isinstance(preds, pd.DataFrame):
-            preds = preds.to_dict(orient="records")  # Convert DataFrame to a list of dictionaries
-        elif isinstance(preds, np.ndarray):
-            preds = preds.tolist()  # Convert numpy array to list
-        elif isinstance(preds, dict):
-            preds = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in preds.items()}
-
-        return {"predictions": preds}
+        preds = await apredict_stream(parquet_file, classification_service_instance.apredict_classification, settings.streaming_batch_rows, plan, counter=connection_counter)
+        return serialize(preds, media_type, lambda: {"predictions": to_jsonable(preds)})
     except Exception as e :
         raise HTTPException(status_code=500 , detail="Prediction failed.")
+    finally :
+        lease.release()
     
 
 
 @router.post(path="/predict-attack")
-async def predict_attack(file: UploadFile = File(...)):
-    content = await file.read()
-    parquet_buffer = BytesIO(content)
-    
+async def predict_attack(file: UploadFile = File(...), stream: bool = False, accept: Optional[str] = Header(None)):
+    media_type = negotiate(accept)
+
+    # The upload is decoded row group by row group, and only the columns the model reads
+    plan = detection_service_instance.plan
     try:
-        features = pd.read_parquet(parquet_buffer)
+        parquet_file = await run_inference(open_parquet, file, detach=stream, plan=plan, counter=connection_counter)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail="Failed to read Parquet file.")
 
+    lease = await _admit("/predict-attack", parquet_file)
+    if stream:
+        # Emit one NDJSON line per scored chunk, the slot is held until the last one
+        return ndjson_response(parquet_file, detection_service_instance.apredict_detection, settings.streaming_batch_rows, to_jsonable, plan, on_close=lease.release, counter=connection_counter)
+
     try:
-        preds = await detection_service_instance.apredict_detection(features)
-        
-        # Ensure preds is in JSON-compatible format
-        if isinstance(preds, pd.DataFrame):
-            preds = preds.to_dict(orient="records")  # Convert DataFrame to a list of dictionaries
-        elif isinstance(preds, np.ndarray):
-            preds = preds.tolist()  # Convert numpy array to list
-        elif isinstance(preds, dict):
-            preds = {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in preds.items()}
-
-        return {"predictions": preds}
+        preds = await apredict_stream(parquet_file, detection_service_instance.apredict_detection, settings.streaming_batch_rows, plan, counter=connection_counter)
+        return serialize(preds, media_type, lambda: {"predictions": to_jsonable(preds)})
     except Exception as e:
         raise HTTPException(status_code=500, detail="Prediction failed.")
+    finally:
+        lease.release()
+
+
+@router.get(path="/cache-stats")
+async def cache_stats():
+    # Counters of this worker's prediction caches, to size them
+    return {
+        "predict-attack": detection_service_instance.cache.stats() if detection_service_instance.cache is not None else None,
+        "predict-attack-cat": classification_service_instance.cache.stats() if classification_service_instance.cache is not None else None,
+    }
+
+
+@router.get(path="/admission-stats")
+async def admission_stats():
+    # Queue depth and shed requests of this worker's admission controllers, empty when disabled
+    return {endpoint: controller.stats() for endpoint, controller in get_admission_controllers().items()}
@@ -0,0 +1,277 @@
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+from fastapi.responses import JSONResponse
+from api_src.config.settings import get_settings
+from api_src.services.metrics import ADMISSION_QUEUED_ROWS, ADMISSION_REJECTED
+
+# Endpoints behind admission control
+ADMISSION_ENDPOINTS = ["/predict-all", "/predict-attack-cat", "/predict-attack"]
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request would wait longer than the deadline, or overflow the queue."""
+
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+@dataclass(eq=False)
+class _Waiter:
+    rows: int
+    future: asyncio.Future
+
+
+class Lease:
+    """A request's slot, held until `release` is called. Releasing twice is a no-op."""
+
+    def __init__(self, controller: Optional["AdmissionController"], rows: int):
+        self.controller = controller
+        self.rows = rows
+        self.start = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if self._released or self.controller is None:
+            return
+        self._released = True
+        self.controller._release(self.rows, time.perf_counter() - self.start)
+
+
+class AdmissionController:
+    """
+    Per-endpoint concurrency limit with a bounded wait queue measured in rows.
+
+    At most `max_concurrency` requests of the endpoint are scored at once, the others
+    wait in arrival order. The cost of a request is its number of rows, so the queue is
+    bounded by `max_queue_rows` and its delay is estimated from the rows ahead and the
+    rows per second the endpoint completes while all its slots are busy (an exponential
+    moving average). That drain rate includes everything else the worker does meanwhile,
+    uploads parsed, responses sent, other endpoints; until the endpoint has been saturated
+    once, the rate of a single slot times the number of slots stands in for it. A request
+    is rejected on arrival, before any scoring, when it would overflow the queue or when
+    the estimated delay exceeds `deadline_s` : under overload some requests are shed
+    instead of all of them slowing down.
+
+    The state lives on the event loop of one worker, it needs no lock.
+
+    Attributes:
+        endpoint (str): The endpoint controlled.
+        max_concurrency (int): The maximum number of requests scored at once.
+        max_queue_rows (int): The maximum number of rows waiting.
+        deadline_s (float): The estimated queue delay beyond which requests are rejected.
+        rows_per_s (float): The rows per second the endpoint completes while saturated, None until it has been.
+        slot_rows_per_s (float): The rows per second of one slot, None until a request completes.
+
+    Methods:
+        acquire: Wait for a slot, or reject the request.
+        check: Reject a request if the endpoint is over its deadline, before its rows are known.
+        estimated_delay: Estimate how long a new request would wait.
+        stats: Report the queue depth, throughput estimate and counters.
+    """
+
+    def __init__(self, endpoint: str, max_concurrency: int, max_queue_rows: int, deadline_s: float, smoothing: float = 0.2):
+        self.endpoint = endpoint
+        self.max_concurrency = max_concurrency
+        self.max_queue_rows = max_queue_rows
+        self.deadline_s = deadline_s
+        self.smoothing = smoothing
+        self.rows_per_s: Optional[float] = None
+        self.slot_rows_per_s: Optional[float] = None
+        self._last_release: Optional[float] = None
+        self.in_flight = 0
+        self.in_flight_rows = 0
+        self.queued_rows = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def estimated_delay(self) -> float:
+        """Estimate how long a request arriving now would wait for a slot.
+
+        Returns:
+            float: The seconds to score the queued rows and, on average, half of the rows in flight.
+        """
+        rate = self.rows_per_s
+        if rate is None:
+            if self.slot_rows_per_s is None:
+                return 0.0
+            rate = self.slot_rows_per_s * self.max_concurrency
+        rows_ahead = self.queued_rows + self.in_flight_rows / 2
+        return rows_ahead / rate
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        ADMISSION_REJECTED.labels(self.endpoint, reason).inc()
+        raise AdmissionRejected(reason, max(1, math.ceil(self.estimated_delay())))
+
+    def check(self):
+        """Reject a request if the endpoint is over its deadline, before its rows are known.
+
+        Raises:
+            AdmissionRejected: The estimated delay exceeds the deadline.
+        """
+        if self.in_flight >= self.max_concurrency and self.estimated_delay() > self.deadline_s:
+            self._reject("deadline")
+
+    def _start(self, rows: int):
+        self.in_flight += 1
+        self.in_flight_rows += rows
+        self.admitted += 1
+
+    async def acquire(self, rows: int) -> Lease:
+        """Wait for a slot, or reject the request.
+
+        Args:
+            rows (int): The number of rows of the request.
+
+        Returns:
+            Lease: The slot, to release once the response is sent.
+
+        Raises:
+            AdmissionRejected: The queue is full or the estimated delay exceeds the deadline.
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self._start(rows)
+            return Lease(self, rows)
+
+        # An idle endpoint admits a request of any size, a busy one bounds what waits
+        if self.queued_rows + rows > self.max_queue_rows:
+            self._reject("queue_full")
+        if self.estimated_delay() > self.deadline_s:
+            self._reject("deadline")
+
+        waiter = _Waiter(rows, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.queued_rows += rows
+        ADMISSION_QUEUED_ROWS.labels(self.endpoint).inc(rows)
+        self.waited += 1
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                # Still queued : leave the queue
+                self._waiters.remove(waiter)
+                self.queued_rows -= rows
+                ADMISSION_QUEUED_ROWS.labels(self.endpoint).dec(rows)
+            else:
+                # Granted a slot as the client went away : hand it on, without a throughput sample
+                self._release(rows, 0.0)
+            raise
+        return Lease(self, rows)
+
+    def _smooth(self, average: Optional[float], sample: float) -> float:
+        return sample if average is None else average + self.smoothing * (sample - average)
+
+    def _release(self, rows: int, seconds: float):
+        now = time.perf_counter()
+        if rows > 0 and seconds > 0:
+            self.slot_rows_per_s = self._smooth(self.slot_rows_per_s, rows / seconds)
+            if self.in_flight >= self.max_concurrency and self._last_release is not None and now > self._last_release:
+                # Saturated since the previous completion : the rows completed meanwhile are the drain rate
+                self.rows_per_s = self._smooth(self.rows_per_s, rows / (now - self._last_release))
+            self._last_release = now
+        self.in_flight -= 1
+        self.in_flight_rows -= rows
+
+        while self.in_flight < self.max_concurrency and self._waiters:
+            waiter = self._waiters.popleft()
+            self.queued_rows -= waiter.rows
+            ADMISSION_QUEUED_ROWS.labels(self.endpoint).dec(waiter.rows)
+            self._start(waiter.rows)
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict:
+        """Report the queue depth, throughput estimate and counters of this worker.
+
+        Returns:
+            Dict: The requests and rows in flight and waiting, the rows per second of a slot,
+                the estimated delay and the admitted, waited and rejected counts.
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "in_flight_rows": self.in_flight_rows,
+            "queued": len(self._waiters),
+            "queued_rows": self.queued_rows,
+            "max_queue_rows": self.max_queue_rows,
+            "rows_per_s": round(self.rows_per_s, 1) if self.rows_per_s is not None else None,
+            "slot_rows_per_s": round(self.slot_rows_per_s, 1) if self.slot_rows_per_s is not None else None,
+            "estimated_delay_s": round(self.estimated_delay(), 4),
+            "deadline_s": self.deadline_s,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "rejected": self.rejected,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_admission_controllers() -> Dict[str, AdmissionController]:
+    """The admission controllers of this worker, by endpoint, or none when admission control is disabled."""
+    settings = get_settings()
+    if not settings.admission_enabled:
+        return {}
+    return {
+        endpoint: AdmissionController(
+            endpoint,
+            max_concurrency=settings.admission_endpoint_concurrency.get(endpoint, settings.admission_max_concurrency),
+            max_queue_rows=settings.admission_max_queue_rows,
+            deadline_s=settings.admission_deadline_s,
+        )
+        for endpoint in ADMISSION_ENDPOINTS
+    }
+
+
+async def admit(endpoint: str, rows: int) -> Lease:
+    """Wait for a slot of the endpoint, admitting at once when admission control is disabled.
+
+    Args:
+        endpoint (str): The endpoint path.
+        rows (int): The number of rows of the request.
+
+    Returns:
+        Lease: The slot, to release once the response is sent.
+
+    Raises:
+        AdmissionRejected: The request is shed.
+    """
+    controller = get_admission_controllers().get(endpoint)
+    if controller is None:
+        return Lease(None, rows)
+    return await controller.acquire(rows)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware rejecting the requests of an endpoint over its deadline before their body is read.
+
+    Uploads are parsed before the endpoint can count their rows : under overload, parsing
+    the uploads of requests that will be shed anyway is work the admitted ones wait for.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        controller = get_admission_controllers().get(scope["path"]) if scope["type"] == "http" else None
+        if controller is not None:
+            try:
+                controller.check()
+            except AdmissionRejected as e:
+                response = JSONResponse(
+                    {"detail": f"Server overloaded ({e.reason}), retry later."},
+                    status_code=429, headers={"Retry-After": str(e.retry_after_s)},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,140 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+import numpy as np
+import pandas as pd
+from api_src.logger.logger import get_logger
+from api_src.services.executor import run_inference
+
+logger = get_logger(__file__)
+
+
+@dataclass
+class _BatchItem:
+    features: pd.DataFrame
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """
+    Combines the rows of concurrent prediction requests into a single model call.
+
+    Requests arriving within `max_wait_ms` of the first queued request are
+    concatenated, up to `max_batch_rows` rows, into one DataFrame. The batch is
+    preprocessed and scored once, then the predictions are split back out to
+    each waiting request. If a batch fails, its requests are scored one by one
+    so that only the request at fault fails.
+
+    At most `max_queued` requests wait to be batched. Further requests wait in
+    `submit` for room in the queue.
+
+    Attributes:
+        predict (Callable): The blocking predict function called on each batch.
+        max_batch_rows (int): The maximum number of rows in a batch.
+        max_wait_ms (float): The maximum time the first request waits for others to join.
+        thread_count (int): The CatBoost thread_count passed to the predict function.
+        max_queued (int): The maximum number of requests waiting to be batched.
+
+    Methods:
+        submit: Queue a DataFrame and wait for its predictions.
+    """
+
+    def __init__(self, predict: Callable, max_batch_rows: int, max_wait_ms: float, thread_count: int = -1, max_queued: int = 1024):
+        self.predict = predict
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self.thread_count = thread_count
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._carry: Optional[_BatchItem] = None
+        self._running_batches = set()
+
+    async def submit(self, features: pd.DataFrame) -> Any:
+        """Queue a DataFrame for the next batch and wait for its predictions.
+
+        Args:
+            features (pd.DataFrame): The raw input rows of one request.
+
+        Returns:
+            Any: The predictions for these rows, in the shape the predict function returns.
+        """
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._task = asyncio.create_task(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_BatchItem(features=features, future=future))
+        return await future
+
+    async def _next_item(self, timeout: Optional[float]) -> _BatchItem:
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        if timeout is None:
+            return await self._queue.get()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._next_item(None)]
+            rows = len(batch[0].features)
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await self._next_item(timeout)
+                except asyncio.TimeoutError:
+                    break
+                if rows + len(item.features) > self.max_batch_rows:
+                    # Keep the request whole and start the next batch with it
+                    self._carry = item
+                    break
+                batch.append(item)
+                rows += len(item.features)
+
+            task = asyncio.create_task(self._process(batch))
+            self._running_batches.add(task)
+            task.add_done_callback(self._running_batches.discard)
+
+    async def _process(self, batch: List[_BatchItem]):
+        if len(batch) == 1:
+            await self._process_alone(batch[0])
+            return
+        try:
+            features = pd.concat([item.features for item in batch], ignore_index=True)
+            logger.debug("Scoring batch of %d rows from %d requests", len(features), len(batch))
+
+            result = await run_inference(self.predict, features, thread_count=self.thread_count)
+            offsets = np.cumsum([len(item.features) for item in batch])[:-1]
+            parts = _split(result, offsets)
+        except Exception as e:
+            # One request's rows can fail the whole batch : score each on its own so only that one fails
+            logger.warning("Batch of %d requests failed, scoring them one by one. %s", len(batch), e)
+            await asyncio.gather(*(self._process_alone(item) for item in batch))
+            return
+
+        for item, part in zip(batch, parts):
+            if not item.future.done():
+                item.future.set_result(part)
+
+    async def _process_alone(self, item: _BatchItem):
+        try:
+            result = await run_inference(self.predict, item.features, thread_count=self.thread_count)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(result)
+
+
+def _split(result: Any, offsets: np.ndarray) -> list:
+    """Split a batch result at the given row offsets, one part per request."""
+    if isinstance(result, tuple):
+        return list(zip(*(_split(element, offsets) for element in result)))
+    return np.split(np.asarray(result), offsets)
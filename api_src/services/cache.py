@@ -0,0 +1,213 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+import numpy as np
+import pandas as pd
+from api_src.logger.logger import get_logger
+from src.utils.hashing import file_digest
+
+logger = get_logger(__file__)
+
+# Approximate bytes taken by one OrderedDict entry besides its key and value
+_ENTRY_OVERHEAD = 100
+
+
+def model_version(model_path: str) -> str:
+    """Identify a model file by its name and the digest of its content.
+
+    Args:
+        model_path (str): The path to the trained model.
+
+    Returns:
+        str: `<file name>@<first 12 hex digits of its sha256>`.
+    """
+    return f"{os.path.basename(model_path)}@{file_digest(model_path)[:12]}"
+
+
+class PredictionCache:
+    """
+    Bounded LRU/TTL cache of per-row predictions in front of a blocking predict function.
+
+    Each row is keyed by a 64-bit hash of its raw model input columns, tagged with
+    the model version. A call first dedupes the rows of its batch, looks the unique
+    rows up in the cache, scores only the missing ones and scatters the results
+    back to every row.
+
+    Attributes:
+        predict (Callable): The blocking predict function, returning one prediction per row.
+        columns (list): The raw input columns the model reads, hashed in this order.
+        model_version (str): The version of the model whose predictions are cached.
+        max_entries (int): The maximum number of cached rows.
+        ttl_s (float): The time after which a cached prediction expires. 0 disables expiry.
+
+    Methods:
+        __call__: Predict a DataFrame, scoring only the rows not found in the cache.
+        set_model_version: Tag new entries with another model version and drop the old ones.
+        stats: Report the hit rate, evictions and memory use of the cache.
+    """
+
+    def __init__(self, predict: Callable, columns: List[str], model_version: str, max_entries: int = 100000, ttl_s: float = 300.0):
+        self.predict = predict
+        self.columns = list(columns)
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._entry_bytes = 0
+        self._dtype = None
+        self._rows = 0
+        self._unique_rows = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def __call__(self, df: pd.DataFrame, **kwargs) -> Any:
+        """Predict a DataFrame, scoring only the distinct rows not found in the cache.
+
+        Args:
+            df (pd.DataFrame): The raw input rows.
+            **kwargs: Passed to the predict function, e.g. thread_count.
+
+        Returns:
+            np.ndarray: The predictions, in the shape the predict function returns.
+        """
+        if len(df) == 0:
+            return self.predict(df, **kwargs)
+
+        row_hashes = pd.util.hash_pandas_object(df[self.columns], index=False).to_numpy()
+        unique_hashes, first_rows, inverse = np.unique(row_hashes, return_index=True, return_inverse=True)
+        version = self.model_version
+
+        now = time.monotonic()
+        found = []
+        missing = []
+        with self._lock:
+            for position, row_hash in enumerate(unique_hashes.tolist()):
+                key = (version, row_hash)
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_s > 0 and entry[0] <= now:
+                    del self._entries[key]
+                    self._expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(position)
+                else:
+                    self._entries.move_to_end(key)
+                    found.append((position, entry[1]))
+            self._rows += len(df)
+            self._unique_rows += len(unique_hashes)
+            self._hits += len(found)
+            self._misses += len(missing)
+
+        if not found:
+            # Nothing cached : score the distinct rows only
+            scored = self.predict(df.iloc[first_rows], **kwargs)
+            self._store(version, unique_hashes, scored)
+            return scored[inverse]
+
+        if missing:
+            scored = self.predict(df.iloc[first_rows[missing]], **kwargs)
+            self._store(version, unique_hashes[missing], scored)
+            unique = np.empty((len(unique_hashes),) + scored.shape[1:], dtype=scored.dtype)
+            unique[missing] = scored
+        else:
+            sample = found[0][1]
+            unique = np.empty((len(unique_hashes),) + np.shape(sample), dtype=self._dtype)
+        for position, value in found:
+            unique[position] = value
+        return unique[inverse]
+
+    def _store(self, version: str, row_hashes: np.ndarray, scored: np.ndarray):
+        expires = time.monotonic() + self.ttl_s
+        # Plain Python values, so entries do not keep the scored array alive
+        values = [tuple(row) for row in scored.tolist()] if scored.ndim > 1 else scored.tolist()
+        entries = self._entries
+        with self._lock:
+            if version != self.model_version:
+                # The model was swapped while these rows were scored : their key would never be read again
+                return
+            self._dtype = scored.dtype
+            for row_hash, value in zip(row_hashes.tolist(), values):
+                key = (version, row_hash)
+                entries[key] = (expires, value)
+                entries.move_to_end(key)
+            if self._entry_bytes == 0 and values:
+                self._entry_bytes = self._entry_size(key, value)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._evictions += 1
+
+    @staticmethod
+    def _entry_size(key: tuple, value: Any) -> int:
+        # Every entry of a cache holds the same types, so one measure sizes them all
+        size = sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+        if isinstance(value, tuple):
+            size += sum(sys.getsizeof(item) for item in value)
+        return size
+
+    def set_model_version(self, model_version: str, columns: Optional[List[str]] = None):
+        """Tag new entries with another model version and drop the entries of the previous one.
+
+        Args:
+            model_version (str): The version of the model now behind the predict function.
+            columns (list): The raw input columns the new model reads, if they changed.
+        """
+        with self._lock:
+            self.model_version = model_version
+            if columns is not None:
+                self.columns = list(columns)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Report the counters of the cache since it was created.
+
+        `dedup_rate` is the share of rows saved by in-batch deduplication, `hit_rate`
+        the share of distinct rows found in the cache.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "model_version": self.model_version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "memory_bytes": len(self._entries) * self._entry_bytes,
+                "rows": self._rows,
+                "unique_rows": self._unique_rows,
+                "dedup_rate": 1 - self._unique_rows / self._rows if self._rows else 0.0,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+def create_prediction_cache(predict: Callable, model: Any, settings: Any) -> Optional[PredictionCache]:
+    """Wrap a model's predict function with a PredictionCache when caching is enabled.
+
+    Args:
+        predict (Callable): The blocking predict function to wrap.
+        model (Any): The DetectionModel or ClassificationModel behind `predict`.
+        settings (Settings): The application settings.
+
+    Returns:
+        PredictionCache: The cache, or None when `prediction_cache_enabled` is false.
+    """
+    if not settings.prediction_cache_enabled:
+        return None
+    return PredictionCache(
+        predict=predict,
+        columns=model.preprocessor.plan.input_features,
+        model_version=model_version(model.model_path),
+        max_entries=settings.prediction_cache_max_entries,
+        ttl_s=settings.prediction_cache_ttl_s,
+    )
@@ -0,0 +1,42 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from api_src.config.settings import get_settings
+from api_src.logger.logger import get_logger
+
+logger = get_logger(__file__)
+
+
+@functools.lru_cache(maxsize=None)
+def get_inference_executor() -> Optional[ThreadPoolExecutor]:
+    """Function to get and cache the thread pool used for inference.
+    Returns None when the executor mode is disabled in the settings."""
+    settings = get_settings()
+    if not settings.inference_executor_enabled:
+        return None
+
+    logger.info(f"Starting inference executor with {settings.inference_executor_workers} workers")
+    return ThreadPoolExecutor(
+        max_workers=settings.inference_executor_workers,
+        thread_name_prefix="inference",
+    )
+
+
+async def run_inference(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking inference call on the inference executor.
+
+    Falls back to calling the function inline when the executor is disabled.
+
+    Args:
+        func (Callable): The blocking function to call.
+
+    Returns:
+        Any: The result of the function call.
+    """
+    executor = get_inference_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
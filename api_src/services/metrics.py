@@ -0,0 +1,145 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Iterable, List, Optional
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from src.utils.profiling import add_observer
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples to that directory
+# and /metrics aggregates them, whichever worker answers the scrape.
+
+STAGE_SECONDS = Histogram(
+    "mlengine_stage_duration_seconds",
+    "Duration of each step of the request path.",
+    ["stage", "model"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUEST_SECONDS = Histogram(
+    "mlengine_request_duration_seconds",
+    "Duration of prediction requests, until the last byte of the response is sent.",
+    ["endpoint"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REQUEST_ROWS = Histogram(
+    "mlengine_request_rows",
+    "Number of rows scored per prediction request.",
+    ["endpoint"],
+    buckets=(1, 10, 100, 1000, 10000, 65536, 100000, 1000000, 10000000),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "mlengine_requests_in_flight",
+    "Prediction requests being processed.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+REQUESTS = Counter(
+    "mlengine_requests",
+    "Prediction requests by response status.",
+    ["endpoint", "status"],
+)
+ADMISSION_QUEUED_ROWS = Gauge(
+    "mlengine_admission_queued_rows",
+    "Rows of the prediction requests waiting for an admission slot.",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "mlengine_admission_rejected",
+    "Prediction requests rejected with 429 by admission control.",
+    ["endpoint", "reason"],
+)
+MODEL_CALLS = Counter(
+    "mlengine_model_calls",
+    "Calls to the models' predict functions.",
+    ["model", "method"],
+)
+MODEL_ROWS = Counter(
+    "mlengine_model_rows",
+    "Rows scored by each model.",
+    ["model"],
+)
+
+# Rows decoded for the current request, shared with the tasks it spawns
+_request_rows: ContextVar[Optional[List[int]]] = ContextVar("request_rows", default=None)
+
+
+def _observe_stage(stage: str, seconds: float, model: str, rows: int):
+    STAGE_SECONDS.labels(stage, model).observe(seconds)
+    if stage in ("predict", "predict_proba"):
+        MODEL_CALLS.labels(model, stage).inc()
+        MODEL_ROWS.labels(model).inc(rows)
+
+
+def enable_metrics():
+    """Record the durations of the timed stages of src and api_src into the Prometheus histograms."""
+    add_observer(_observe_stage)
+
+
+def add_request_rows(rows: int):
+    """Count rows decoded for the request being processed, if it is instrumented.
+
+    Args:
+        rows (int): The number of rows.
+    """
+    counter = _request_rows.get()
+    if counter is not None:
+        counter[0] += rows
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the duration, status, rows and concurrency of requests.
+
+    Only the given endpoints are recorded, so unknown paths do not create new label values.
+    Streaming responses are timed until their last chunk is sent.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        endpoints (set): The paths to record.
+    """
+
+    def __init__(self, app, endpoints: Iterable[str]):
+        self.app = app
+        self.endpoints = set(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        status = [500]
+        rows = [0]
+        token = _request_rows.set(rows)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            in_flight.dec()
+            REQUESTS.labels(endpoint, str(status[0])).inc()
+            if status[0] < 400:
+                REQUEST_ROWS.labels(endpoint).observe(rows[0])
+            _request_rows.reset(token)
+
+
+def metrics_response() -> Response:
+    """Render the metrics of every worker in the Prometheus text format.
+
+    Returns:
+        Response: The metrics page.
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
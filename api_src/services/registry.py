@@ -0,0 +1,62 @@
+import asyncio
+import functools
+from typing import TYPE_CHECKING
+from api_src.config.settings import get_settings
+from api_src.logger.logger import get_logger
+
+if TYPE_CHECKING:
+    from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry
+
+logger = get_logger(__file__)
+
+
+@functools.lru_cache(maxsize=None)
+def get_model_registry() -> "ModelRegistry":
+    """Function to get and cache the model registry.
+    The active versions of the manifest are loaded and warmed up on the first call."""
+    # Imported here, so that importing this module does not import catboost and pandas
+    from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry
+
+    settings = get_settings()
+    registry = ModelRegistry(
+        manifest_path=settings.model_manifest_path,
+        backend=settings.inference_backend,
+        cascade=settings.predict_all_cascade,
+        threshold=settings.predict_all_threshold,
+        warmup_rows=settings.model_warmup_rows,
+    )
+    models = registry.load()
+    logger.info(f"Serving models {models.versions}, warmed up in {models.warmup_ms:.0f} ms")
+    return registry
+
+
+async def reload_models(registry: "ModelRegistry") -> bool:
+    """Load the manifest again in a separate thread, so requests keep being served meanwhile.
+
+    Args:
+        registry (ModelRegistry): The registry to reload.
+
+    Returns:
+        bool: True if other versions are now served.
+    """
+    swapped = await asyncio.to_thread(registry.reload)
+    if swapped:
+        logger.info(f"Swapped in models {registry.active.versions}, warmed up in {registry.active.warmup_ms:.0f} ms")
+    return swapped
+
+
+async def watch_manifest(registry: "ModelRegistry", interval_s: float):
+    """Reload the models whenever the manifest changes on disk, until cancelled.
+
+    Args:
+        registry (ModelRegistry): The registry to keep up to date.
+        interval_s (float): The time between two checks of the manifest.
+    """
+    while True:
+        await asyncio.sleep(interval_s)
+        if not registry.manifest_changed():
+            continue
+        try:
+            await reload_models(registry)
+        except Exception as e:
+            logger.error(f"Failed to reload the models, still serving {registry.active.versions} : {e}")
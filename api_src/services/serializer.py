@@ -0,0 +1,156 @@
+from typing import Any, Callable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+from src.utils.profiling import stage
+
+try:
+    import msgpack
+except ImportError:  # msgpack responses are only offered when the package is installed
+    msgpack = None
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+NUMPY = "application/x-numpy"
+MSGPACK = "application/msgpack"
+
+# Media types a client may ask for, mapped to the encoding sent back
+_ALIASES = {
+    JSON: JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    ARROW: ARROW,
+    NUMPY: NUMPY,
+    "application/octet-stream": NUMPY,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+
+
+def to_jsonable(preds: Any) -> Any:
+    """Convert predictions to JSON-compatible Python objects.
+
+    Args:
+        preds (Any): The predictions, as a np.ndarray, pd.DataFrame or dict of arrays.
+
+    Returns:
+        Any: The predictions as lists, dicts and scalars.
+    """
+    if isinstance(preds, pd.DataFrame):
+        return preds.to_dict(orient="records")
+    if isinstance(preds, np.ndarray):
+        return preds.tolist()
+    if isinstance(preds, dict):
+        return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in preds.items()}
+    return preds
+
+
+def _parse_accept(accept: str) -> List[Tuple[float, int, str]]:
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type:
+            ranges.append((quality, -position, media_type.lower()))
+    return sorted(ranges, reverse=True)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response encoding from an `Accept` header, JSON when it is missing.
+
+    Args:
+        accept (str): The value of the `Accept` header.
+
+    Returns:
+        str: The media type of the response: JSON, ARROW, NUMPY or MSGPACK.
+
+    Raises:
+        HTTPException: 406 when none of the accepted media types is supported.
+    """
+    if not accept:
+        return JSON
+    for quality, _, media_type in _parse_accept(accept):
+        encoding = _ALIASES.get(media_type)
+        if quality <= 0 or encoding is None or (encoding == MSGPACK and msgpack is None):
+            continue
+        return encoding
+    supported = [JSON, ARROW, NUMPY] + ([MSGPACK] if msgpack is not None else [])
+    raise HTTPException(status_code=406, detail=f"Unsupported Accept header. Supported media types : {', '.join(supported)}")
+
+
+def _column(predictions: np.ndarray) -> np.ndarray:
+    # Single-label predictions come as (n, 1), send them as one flat column
+    if predictions.ndim == 2 and predictions.shape[1] == 1:
+        return predictions[:, 0]
+    return predictions
+
+
+def _to_arrow(predictions: np.ndarray, name: str) -> bytes:
+    column = _column(predictions)
+    if column.ndim > 1:
+        array = pa.array(column.tolist())
+    elif column.dtype == object:
+        # A handful of distinct labels : send each once and the rows as indices
+        array = pa.array(column, type=pa.string(), from_pandas=True).dictionary_encode()
+    else:
+        array = pa.array(column)
+    table = pa.table({name: array})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _to_numpy(predictions: np.ndarray) -> Tuple[bytes, dict]:
+    # Labels are sent as fixed-width UTF-32 strings, numbers as-is, all little-endian
+    if predictions.dtype == object:
+        predictions = predictions.astype(str)
+    predictions = np.ascontiguousarray(predictions, dtype=predictions.dtype.newbyteorder("<"))
+    headers = {
+        "X-Numpy-Dtype": predictions.dtype.str,
+        "X-Numpy-Shape": ",".join(str(size) for size in predictions.shape),
+    }
+    return predictions.tobytes(), headers
+
+
+def serialize(predictions: Union[np.ndarray, Callable[[], np.ndarray]], media_type: str, json_body: Callable[[], Any], name: str = "predictions") -> Response:
+    """Encode the predictions of an endpoint in the negotiated media type.
+
+    JSON and msgpack carry the endpoint's usual response body. Arrow IPC and the raw
+    NumPy buffer carry the predictions as one column, skipping the conversion to lists.
+
+    Args:
+        predictions (np.ndarray): The predictions, one row per input row, or a function building
+            them, only called for Arrow and NumPy.
+        media_type (str): The encoding returned by `negotiate`.
+        json_body (Callable): Builds the JSON-compatible body, only called for JSON and msgpack.
+        name (str): The column name of the predictions in Arrow responses.
+
+    Returns:
+        Response: The encoded response.
+    """
+    with stage("serialize"):
+        return _encode(predictions, media_type, json_body, name)
+
+
+def _encode(predictions: Union[np.ndarray, Callable[[], np.ndarray]], media_type: str, json_body: Callable[[], Any], name: str) -> Response:
+    if media_type in (ARROW, NUMPY) and callable(predictions):
+        predictions = predictions()
+    if media_type == ARROW:
+        return Response(content=_to_arrow(predictions, name), media_type=ARROW)
+    if media_type == NUMPY:
+        content, headers = _to_numpy(predictions)
+        return Response(content=content, media_type=NUMPY, headers=headers)
+    if media_type == MSGPACK:
+        return Response(content=msgpack.packb(json_body()), media_type=MSGPACK)
+    return JSONResponse(content=json_body())
@@ -1,20 +1,17 @@
-from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry
 import pandas as pd 
 from api_src.logger.logger import get_logger
+from api_src.services.service_predict_base import ServicePredictBase
 
 logger = get_logger(__file__)
 
 
-class ServicePredict() : 
-    def __init__(self, model : DetectionModel) :
-        self.model = model 
+class ServicePredict(ServicePredictBase) : 
+    def __init__(self, registry : ModelRegistry) :
+        super().__init__(registry, lambda models : models.detection)
 
     async def apredict_detection(self , features : pd.DataFrame ) : 
         try : 
-            preds = self.model.predict(features)
-            return preds
+            return await self.apredict(features)
         except Exception as e : 
             logger.error(f"Error occured in service_predict.apredict_attack : {e}")
-
-        
-        
\ No newline at end of file
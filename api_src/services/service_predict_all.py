@@ -0,0 +1,24 @@
+from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry
+import pandas as pd 
+from api_src.logger.logger import get_logger
+from api_src.services.service_predict_base import ServicePredictBase
+
+logger = get_logger(__file__)
+
+
+class ServicePredictAll(ServicePredictBase) : 
+    def __init__(self, registry : ModelRegistry) :
+        # The combined predictions are not cached
+        super().__init__(registry, lambda models : models.combined, cached = False)
+
+    @property
+    def plan(self) :
+        # Plan of the union of both models' features
+        return self.registry.active.combined.plan
+
+    async def apredict_all(self , features : pd.DataFrame ) : 
+        try : 
+            preds, preds_cat = await self.apredict(features)
+            return preds, preds_cat
+        except Exception as e : 
+            logger.error(f"Error occured in service_predict_all.apredict_all : {e}")
@@ -0,0 +1,68 @@
+from typing import Any, Callable
+from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry, ModelSet
+import pandas as pd 
+from api_src.config.settings import get_settings
+from api_src.services.executor import run_inference
+from api_src.services.batcher import MicroBatcher
+from api_src.services.cache import create_prediction_cache, model_version
+
+settings = get_settings()
+
+
+class ServicePredictBase() :
+    """
+    Scoring shared by the prediction services : registry leases, prediction cache and micro-batching.
+
+    Attributes:
+        registry (ModelRegistry): The registry serving the active models.
+        get_model (Callable): Picks the model of the service from a ModelSet.
+        thread_count (int): The CatBoost thread_count of each call.
+        cache (PredictionCache): The prediction cache, None when disabled or not `cached`.
+        predict (Callable): The blocking predict function, through the cache when there is one.
+        batcher (MicroBatcher): The micro-batcher, None when batching is disabled.
+
+    Methods:
+        plan: The plan of the active model.
+        apredict: Score a DataFrame off the event loop, through the batcher when enabled.
+    """
+    def __init__(self , registry : ModelRegistry , get_model : Callable[[ModelSet], Any] , cached : bool = True) :
+        self.registry = registry
+        self.get_model = get_model
+        self.thread_count = settings.inference_thread_count
+        self.cache = None
+        if cached :
+            # Known rows are answered from the cache, the others are scored once per distinct row
+            self.cache = create_prediction_cache(self._predict, get_model(registry.active), settings)
+        self.predict = self.cache if self.cache is not None else self._predict
+        if self.cache is not None :
+            self.registry.add_listener(self._on_swap)
+        self.batcher = None
+        if settings.batching_enabled :
+            self.batcher = MicroBatcher(
+                predict = self.predict,
+                max_batch_rows = settings.batching_max_batch_rows,
+                max_wait_ms = settings.batching_max_wait_ms,
+                max_queued = settings.batching_max_queued,
+                thread_count = self.thread_count,
+            )
+
+    def _predict(self , features : pd.DataFrame , thread_count : int = -1) :
+        # Each call is scored by the models active when it starts, even if a reload swaps them meanwhile
+        with self.registry.lease() as models :
+            return self.get_model(models).predict(features, thread_count=thread_count)
+
+    def _on_swap(self , models : ModelSet) :
+        model = self.get_model(models)
+        version = model_version(model.model_path)
+        if version != self.cache.model_version :
+            self.cache.set_model_version(version, model.preprocessor.plan.input_features)
+
+    @property
+    def plan(self) :
+        # Plan of the active model(s) : the columns to decode and how
+        return self.get_model(self.registry.active).preprocessor.plan
+
+    async def apredict(self , features : pd.DataFrame) :
+        if self.batcher is not None :
+            return await self.batcher.submit(features)
+        return await run_inference(self.predict, features, thread_count=self.thread_count)
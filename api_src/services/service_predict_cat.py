@@ -1,16 +1,16 @@
-from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from src.models.UNSW_NB15_models.ModelRegistry import ModelRegistry
 import pandas as pd 
 from api_src.logger.logger import get_logger
+from api_src.services.service_predict_base import ServicePredictBase
 
 logger = get_logger(__file__)
 
-class ServicePredictCat() : 
-    def __init__(self, model : ClassificationModel) :
-        self.model = model 
+class ServicePredictCat(ServicePredictBase) : 
+    def __init__(self, registry : ModelRegistry) :
+        super().__init__(registry, lambda models : models.classification)
 
     async def apredict_classification(self , features : pd.DataFrame ) : 
         try : 
-            preds = self.model.predict(features)
-            return preds
+            return await self.apredict(features)
         except Exception as e : 
-            logger.error(f"Error occured in service_predict.apredict_attack : {e}")
\ No newline at end of file
+            logger.error(f"Error occured in service_predict.apredict_attack : {e}")
@@ -0,0 +1,84 @@
+import functools
+import importlib
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Optional
+from api_src.logger.logger import get_logger
+
+logger = get_logger(__file__)
+
+# Imported before the models are loaded, to time the heavy imports (pandas, pyarrow, catboost) on their own
+HEAVY_MODULES = [
+    "src.models.UNSW_NB15_models.ModelRegistry",
+    "api_src.services.streaming",
+    "api_src.services.serializer",
+]
+
+
+@dataclass
+class StartupState:
+    """
+    Progress of the application's startup, reported by the readiness probe.
+
+    Attributes:
+        status (str): "starting", "ready" or "failed".
+        error (str): Why the startup failed.
+        timings_ms (dict): The duration of each startup phase.
+    """
+    status: str = "starting"
+    error: Optional[str] = None
+    timings_ms: dict = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase into `timings_ms`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 3)
+
+
+@functools.lru_cache(maxsize=None)
+def get_startup_state() -> StartupState:
+    """Function to get the startup state of this process."""
+    return StartupState()
+
+
+def load_prediction_router() -> ModuleType:
+    """Import the prediction router, loading and warming up the models, and record the timings.
+
+    Blocking : called at import time in eager mode, in a thread of the lifespan hook in lazy mode.
+
+    Returns:
+        ModuleType: The router_predict module.
+    """
+    state = get_startup_state()
+    try:
+        with state.phase("import_modules"):
+            for module in HEAVY_MODULES:
+                importlib.import_module(module)
+        with state.phase("load_models"):
+            from api_src.services.registry import get_model_registry
+            models = get_model_registry().active
+        with state.phase("import_router"):
+            from api_src.routers import router_predict
+    except Exception as e:
+        state.status = "failed"
+        state.error = f"{type(e).__name__}: {e}"
+        raise
+
+    state.timings_ms.update({f"load_{name}_model": round(ms, 3) for name, ms in models.load_ms.items()})
+    state.timings_ms["warmup"] = round(models.warmup_ms, 3)
+    return router_predict
+
+
+def mark_ready():
+    """Record the end of the startup and log its breakdown."""
+    state = get_startup_state()
+    state.timings_ms["total"] = round((time.perf_counter() - state.started) * 1000, 3)
+    state.status = "ready"
+    logger.info("Startup breakdown : " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in state.timings_ms.items()))
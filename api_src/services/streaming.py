@@ -0,0 +1,251 @@
+import json
+import tempfile
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from api_src.config.settings import get_settings
+from api_src.logger.logger import get_logger
+from api_src.services.executor import run_inference
+from api_src.services.metrics import add_request_rows
+from src.data.UNSW_NB15_preprocessor.FeaturePlan import FeaturePlan
+from src.features.UNSW_NB15_features.ConnectionCounter import ConnectionCounter
+from src.utils.profiling import stage
+
+logger = get_logger(__file__)
+
+
+@lru_cache(maxsize=None)
+def get_connection_counter() -> Optional[ConnectionCounter]:
+    """The connection-count engine of this worker, or None when the counts are expected from the client."""
+    if not get_settings().connection_counts_enabled:
+        return None
+    return ConnectionCounter()
+
+
+def input_columns(plan: FeaturePlan, counter: Optional[ConnectionCounter] = None) -> List[str]:
+    """Return the columns an upload must have to be scored with a plan.
+
+    Args:
+        plan (FeaturePlan): The plan of the model the rows are scored with.
+        counter (ConnectionCounter): Computes the connection counts, which are then read
+            from the raw columns it keys on instead of from the upload.
+
+    Returns:
+        List[str]: The column names.
+    """
+    if counter is None:
+        return list(plan.input_features)
+    columns = [column for column in plan.input_features if column not in counter.features]
+    return columns + [column for column in counter.input_features if column not in columns]
+
+
+def open_parquet(file: UploadFile, detach: bool = False, plan: Optional[FeaturePlan] = None, counter: Optional[ConnectionCounter] = None) -> pq.ParquetFile:
+    """Open an uploaded parquet file without reading its body into memory.
+
+    The upload is already spooled to a temporary file by the multipart parser,
+    so pyarrow reads the footer and each row group straight from it.
+
+    Args:
+        file (UploadFile): The uploaded parquet file.
+        detach (bool): Take ownership of the spooled body so it stays readable after
+            the endpoint returns, as FastAPI closes uploads before a StreamingResponse
+            is consumed. The caller must close the returned file with `close(force=True)`.
+        plan (FeaturePlan): The plan of the model the rows are scored with. Its categorical
+            columns are decoded as dictionaries, and a file lacking one of its input columns
+            is rejected with a 400 before anything is decoded.
+        counter (ConnectionCounter): Computes the connection counts, see `input_columns`.
+
+    Returns:
+        pq.ParquetFile: The opened parquet file.
+    """
+    with stage("upload_read"):
+        source = file.file
+        if detach:
+            file.file = tempfile.SpooledTemporaryFile()
+        source.seek(0)
+        parquet_file = pq.ParquetFile(source)
+        if plan is None:
+            return parquet_file
+
+        names = set(parquet_file.schema_arrow.names)
+        missing = [column for column in input_columns(plan, counter) if column not in names]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
+        dictionary_columns = [
+            column for column in plan.categorical_features
+            if not pa.types.is_dictionary(parquet_file.schema_arrow.field(column).type)
+        ]
+        if not dictionary_columns:
+            return parquet_file
+        # Reopen to read the categories as dictionary codes instead of one string per row
+        source.seek(0)
+        return pq.ParquetFile(source, read_dictionary=dictionary_columns)
+
+
+def decode_schema(schema: pa.Schema, plan: FeaturePlan, counter: Optional[ConnectionCounter] = None) -> pa.Schema:
+    """Return the schema of the plan's input columns, numerical ones read as float32 where it is exact.
+
+    Args:
+        schema (pa.Schema): The schema of the parquet file.
+        plan (FeaturePlan): The plan of the model the rows are scored with.
+        counter (ConnectionCounter): Computes the connection counts, see `input_columns`.
+
+    Returns:
+        pa.Schema: The columns to decode, in the plan's order, and their types.
+    """
+    float32_columns = set(plan.float32_input_features)
+    fields = []
+    for column in input_columns(plan, counter):
+        field = schema.field(column)
+        if column in float32_columns and (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)):
+            field = field.with_type(pa.float32())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def iter_batches(parquet_file: pq.ParquetFile, batch_rows: int, plan: Optional[FeaturePlan] = None, counter: Optional[ConnectionCounter] = None) -> Iterator[pd.DataFrame]:
+    """Decode a parquet file one row group at a time, in DataFrames of at most `batch_rows` rows.
+
+    Args:
+        parquet_file (pq.ParquetFile): The opened parquet file.
+        batch_rows (int): The maximum number of rows per DataFrame.
+        plan (FeaturePlan): Decode only the input columns of this plan, see `decode_schema`.
+            Defaults to decoding every column as stored.
+        counter (ConnectionCounter): Add the connection counts of the rows, which continue its stream.
+
+    Yields:
+        pd.DataFrame: The decoded rows.
+    """
+    schema = None if plan is None else decode_schema(parquet_file.schema_arrow, plan, counter)
+    columns = None if schema is None else schema.names
+    empty = True
+    for row_group in range(parquet_file.num_row_groups):
+        batches = parquet_file.iter_batches(batch_size=batch_rows, row_groups=[row_group], columns=columns)
+        while True:
+            with stage("parquet_decode"):
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                if schema is not None:
+                    # Unsafe so integers above 2**24 round to the nearest float32, as the plan's own cast does
+                    batch = batch.cast(schema, safe=False)
+                df = batch.to_pandas()
+            if counter is not None:
+                with stage("connection_counts"):
+                    df = counter.transform(df)
+            empty = False
+            yield df
+
+    if empty:
+        df = (schema or parquet_file.schema_arrow).empty_table().to_pandas()
+        yield df if counter is None else counter.transform(df)
+
+
+async def aiter_predictions(parquet_file: pq.ParquetFile, apredict: Callable[[pd.DataFrame], Awaitable[Any]], batch_rows: int, plan: Optional[FeaturePlan] = None, counter: Optional[ConnectionCounter] = None) -> AsyncIterator[Any]:
+    """Run a prediction coroutine on each decoded chunk of a parquet file.
+
+    Only one chunk of raw rows is held in memory at a time. Decoding runs on the
+    inference executor so the event loop stays free.
+
+    Args:
+        parquet_file (pq.ParquetFile): The opened parquet file.
+        apredict (Callable): The service coroutine scoring one DataFrame.
+        batch_rows (int): The maximum number of rows decoded at once.
+        plan (FeaturePlan): Decode only the input columns of this plan.
+        counter (ConnectionCounter): Add the connection counts of the rows.
+
+    Yields:
+        Any: The predictions for each chunk, in the shape `apredict` returns.
+    """
+    batches = iter_batches(parquet_file, batch_rows, plan, counter)
+    while True:
+        features = await run_inference(next, batches, None)
+        if features is None:
+            return
+        add_request_rows(len(features))
+        yield await apredict(features)
+
+
+async def apredict_stream(parquet_file: pq.ParquetFile, apredict: Callable[[pd.DataFrame], Awaitable[Any]], batch_rows: int, plan: Optional[FeaturePlan] = None, counter: Optional[ConnectionCounter] = None) -> Any:
+    """Run a prediction coroutine on each decoded chunk of a parquet file and join the results.
+
+    Args:
+        parquet_file (pq.ParquetFile): The opened parquet file.
+        apredict (Callable): The service coroutine scoring one DataFrame.
+        batch_rows (int): The maximum number of rows decoded at once.
+        plan (FeaturePlan): Decode only the input columns of this plan.
+        counter (ConnectionCounter): Add the connection counts of the rows.
+
+    Returns:
+        Any: The predictions for the whole file, in the shape `apredict` returns.
+    """
+    results = [result async for result in aiter_predictions(parquet_file, apredict, batch_rows, plan, counter)]
+    return concat_predictions(results)
+
+
+def ndjson_response(parquet_file: pq.ParquetFile, apredict: Callable[[pd.DataFrame], Awaitable[Any]], batch_rows: int, format_chunk: Callable[[Any], list], plan: Optional[FeaturePlan] = None, on_close: Optional[Callable[[], None]] = None, counter: Optional[ConnectionCounter] = None) -> StreamingResponse:
+    """Stream the predictions of each chunk as one NDJSON line as soon as it is scored.
+
+    Each line is `{"offset": <first row of the chunk>, "predictions": [...]}`. A failure
+    after the response has started is reported as a final `{"error": ...}` line.
+    The parquet file is closed once the response ends, including when the client
+    disconnects before the first line, which cancels the response before its body is iterated.
+
+    Args:
+        parquet_file (pq.ParquetFile): The parquet file opened with `detach=True`.
+        apredict (Callable): The service coroutine scoring one DataFrame.
+        batch_rows (int): The maximum number of rows decoded and sent at once.
+        format_chunk (Callable): Converts the predictions of one chunk to a JSON-compatible list.
+        plan (FeaturePlan): Decode only the input columns of this plan.
+        on_close (Callable): Called once the response ends, e.g. to release an admission slot.
+        counter (ConnectionCounter): Add the connection counts of the rows.
+
+    Returns:
+        StreamingResponse: The NDJSON response.
+    """
+    async def lines():
+        offset = 0
+        try:
+            async for result in aiter_predictions(parquet_file, apredict, batch_rows, plan, counter):
+                with stage("serialize"):
+                    predictions = format_chunk(result)
+                    line = json.dumps({"offset": offset, "predictions": predictions}) + "\n"
+                yield line
+                offset += len(predictions)
+        except Exception as e:
+            logger.error(f"Streaming prediction failed at row {offset}.{e}")
+            yield json.dumps({"error": "Prediction failed.", "offset": offset}) + "\n"
+
+    def close():
+        parquet_file.close(force=True)
+        if on_close is not None:
+            on_close()
+
+    return _ClosingStreamingResponse(lines(), close, media_type="application/x-ndjson")
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    # Runs `on_close` once the response ends however it ends, unlike a finally in the body generator
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+def concat_predictions(results: List[Any]) -> Any:
+    """Join per-chunk predictions, element-wise for services returning tuples."""
+    if len(results) == 1:
+        return results[0]
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+    return np.concatenate(results)
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from io import BytesIO
+import httpx
+import numpy as np
+import pandas as pd
+
+# Open-loop load generator for the prediction endpoints.
+# Requests are sent on a fixed schedule whatever the server's response times, and each
+# latency is measured from the time the request was scheduled, so queueing delay is counted.
+# Run from the repository root :
+#   python api_src/tests/load_test.py --rate 50 --duration 60 --rows 10 1000
+#   python api_src/tests/load_test.py --rate 10 --ramp-to 400 --duration 300 --slo-ms 250 --output report.json
+
+SAMPLES = [
+    os.path.join("api_src", "tests", "10_samples.parquet"),
+    os.path.join("api_src", "tests", "10_attack_cat_samples.parquet"),
+]
+ENDPOINTS = ["/predict-attack", "/predict-attack-cat", "/predict-all"]
+PERCENTILES = {"p50": 50, "p90": 90, "p99": 99, "p999": 99.9}
+
+
+def build_payloads(rows_list, file_path):
+    """Encode one parquet payload per requested size, by resampling the sample flows."""
+    if file_path:
+        with open(file_path, "rb") as f:
+            content = f.read()
+        return {len(pd.read_parquet(BytesIO(content))): content}
+
+    samples = pd.concat([pd.read_parquet(path) for path in SAMPLES], ignore_index=True)
+    payloads = {}
+    for rows in rows_list:
+        buffer = BytesIO()
+        samples.sample(rows, replace=True, random_state=rows).to_parquet(buffer, index=False)
+        payloads[rows] = buffer.getvalue()
+    return payloads
+
+
+def schedule(rate, ramp_to, duration, arrivals, seed):
+    """Return the send times, in seconds from the start, for a constant or linearly ramped rate.
+
+    The n-th request is sent when the expected number of requests since the start,
+    rate * t + slope * t**2 / 2, reaches n (or the sum of n exponential draws for Poisson
+    arrivals). A ramp can therefore start from a rate of 0.
+    """
+    rng = random.Random(seed)
+    end_rate = rate if ramp_to is None else ramp_to
+    slope = (end_rate - rate) / duration
+    times = []
+    n = 0.0
+    while True:
+        n += rng.expovariate(1.0) if arrivals == "poisson" else 1.0
+        discriminant = rate ** 2 + 2 * slope * n
+        if discriminant < 0 or rate + discriminant ** 0.5 <= 0:
+            # A ramp down to 0 that ends before the n-th request, or no traffic at all
+            return times
+        t = 2 * n / (rate + discriminant ** 0.5)
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+async def send(client, semaphore, url, endpoint, rows, payload, scheduled, start, results):
+    # Wait for the scheduled time, then for a free connection slot : both count in the latency
+    await asyncio.sleep(max(0.0, start + scheduled - time.perf_counter()))
+    async with semaphore:
+        sent = time.perf_counter()
+        result = {"endpoint": endpoint, "rows": rows, "scheduled": scheduled, "status": None, "error": None}
+        try:
+            response = await client.post(url + endpoint, files={"file": ("flows.parquet", payload, "application/octet-stream")})
+            result["status"] = response.status_code
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+        except httpx.TimeoutException:
+            result["error"] = "timeout"
+        except httpx.HTTPError as e:
+            result["error"] = type(e).__name__
+    done = time.perf_counter()
+    result["latency"] = done - (start + scheduled)
+    result["service_time"] = done - sent
+    result["completed"] = done - start
+    results.append(result)
+
+
+def summarize(results, duration):
+    """Aggregate the requests of one group into counts, rates and latency percentiles."""
+    total = len(results)
+    ok = [r for r in results if r["error"] is None]
+    timeouts = sum(r["error"] == "timeout" for r in results)
+    # Requests shed by admission control, counted apart from the errors
+    rejected = sum(r["status"] == 429 for r in results)
+    summary = {
+        "requests": total,
+        "ok": len(ok),
+        "errors": total - len(ok) - timeouts - rejected,
+        "timeouts": timeouts,
+        "rejected": rejected,
+        "error_rate": round((total - len(ok) - timeouts - rejected) / total, 5) if total else 0.0,
+        "timeout_rate": round(timeouts / total, 5) if total else 0.0,
+        "rejected_rate": round(rejected / total, 5) if total else 0.0,
+        "throughput_rps": round(len(ok) / duration, 3) if duration else 0.0,
+        "rows_per_s": round(sum(r["rows"] for r in ok) / duration, 1) if duration else 0.0,
+    }
+    if ok:
+        latencies = np.array([r["latency"] for r in ok]) * 1000
+        service_times = np.array([r["service_time"] for r in ok]) * 1000
+        summary["latency_ms"] = {name: round(float(np.percentile(latencies, q)), 3) for name, q in PERCENTILES.items()}
+        summary["latency_ms"]["mean"] = round(float(latencies.mean()), 3)
+        summary["latency_ms"]["max"] = round(float(latencies.max()), 3)
+        summary["service_time_ms"] = {name: round(float(np.percentile(service_times, q)), 3) for name, q in PERCENTILES.items()}
+    return summary
+
+
+def timeline(results, times, window, slo_ms):
+    """Per window : offered rate and latencies of the requests scheduled in it, throughput of the ones completed in it."""
+    windows = []
+    last = max([times[-1] if times else 0] + [r["completed"] for r in results])
+    for i in range(int(np.ceil(max(last, 1e-9) / window))):
+        start, end = i * window, (i + 1) * window
+        offered = sum(start <= t < end for t in times)
+        scheduled = [r for r in results if start <= r["scheduled"] < end]
+        completed = [r for r in results if start <= r["completed"] < end and r["error"] is None]
+        entry = {"start_s": round(start, 3), "offered_rps": round(offered / window, 3), **summarize(scheduled, window)}
+        entry["throughput_rps"] = round(len(completed) / window, 3)
+        entry["rows_per_s"] = round(sum(r["rows"] for r in completed) / window, 1)
+        if slo_ms is not None:
+            entry["within_slo"] = (
+                entry["requests"] > 0 and entry["error_rate"] + entry["timeout_rate"] == 0
+                and entry.get("latency_ms", {}).get("p99", float("inf")) <= slo_ms
+            )
+        windows.append(entry)
+    return windows
+
+
+async def run(args):
+    payloads = build_payloads(args.rows, args.file)
+    times = schedule(args.rate, args.ramp_to, args.duration, args.arrivals, args.seed)
+    rng = random.Random(args.seed)
+    plan = [(t, args.endpoints[i % len(args.endpoints)], rng.choice(list(payloads))) for i, t in enumerate(times)]
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = []
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(send(client, semaphore, args.url, endpoint, rows, payloads[rows], t, start, results))
+            for t, endpoint, rows in plan
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "config": {
+            "url": args.url,
+            "endpoints": args.endpoints,
+            "rows": sorted(payloads),
+            "rate": args.rate,
+            "ramp_to": args.ramp_to,
+            "duration_s": args.duration,
+            "arrivals": args.arrivals,
+            "concurrency": args.concurrency,
+            "timeout_s": args.timeout,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "summary": summarize(results, elapsed),
+        "by_endpoint": {endpoint: summarize([r for r in results if r["endpoint"] == endpoint], elapsed) for endpoint in args.endpoints},
+        "by_rows": {str(rows): summarize([r for r in results if r["rows"] == rows], elapsed) for rows in sorted(payloads)},
+        "timeline": timeline(results, times, args.window, args.slo_ms),
+    }
+    errors = {}
+    for r in results:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    report["errors"] = errors
+
+    if args.slo_ms is not None:
+        # Highest offered rate served within the SLO, and the lowest one that missed it
+        sending = [entry for entry in report["timeline"] if entry["requests"] > 0]
+        within = [entry["offered_rps"] for entry in sending if entry["within_slo"]]
+        missed = [entry["offered_rps"] for entry in sending if not entry["within_slo"]]
+        report["saturation"] = {
+            "slo_p99_ms": args.slo_ms,
+            "max_rps_within_slo": max(within) if within else None,
+            "min_rps_missing_slo": min(missed) if missed else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the prediction endpoints.")
+    parser.add_argument("--url", default="http://127.0.0.1:8002")
+    parser.add_argument("--endpoints", nargs="+", default=["/predict-attack"], choices=ENDPOINTS, help="endpoints to load, in rotation")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second (the start rate when ramping, 0 allowed)")
+    parser.add_argument("--ramp-to", type=float, help="ramp the rate linearly up to this value over the duration")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds during which requests are sent")
+    parser.add_argument("--arrivals", choices=["uniform", "poisson"], default="uniform", help="evenly spaced or Poisson arrivals")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10], help="rows per request, a size is picked at random per request")
+    parser.add_argument("--file", help="send this parquet file instead of resampled flows")
+    parser.add_argument("--concurrency", type=int, default=256, help="maximum requests in flight, later ones wait client-side")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request counts as timed out")
+    parser.add_argument("--window", type=float, default=1.0, help="seconds per timeline window")
+    parser.add_argument("--slo-ms", type=float, help="p99 latency target used to report the saturation rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    if args.rate < 0 or (args.ramp_to or 0) < 0 or max(args.rate, args.ramp_to or 0) == 0:
+        parser.error("--rate and --ramp-to must not be negative, and one of them must be positive")
+
+    report = asyncio.run(run(args))
+    summary = report["summary"]
+    latency = summary.get("latency_ms", {})
+    print(
+        f"{summary['requests']} requests, {summary['ok']} ok, {summary['errors']} errors, {summary['timeouts']} timeouts, "
+        f"{summary['throughput_rps']} req/s, p50 {latency.get('p50')} ms, p99 {latency.get('p99')} ms, p999 {latency.get('p999')} ms",
+        file=sys.stderr,
+    )
+    if "saturation" in report:
+        saturation = report["saturation"]
+        print(
+            f"p99 <= {args.slo_ms} ms : met up to {saturation['max_rps_within_slo']} req/s, "
+            f"first missed at {saturation['min_rps_missing_slo']} req/s",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+import httpx
+import psutil
+
+# Compare the memory of the uvicorn multi-worker server with the pre-forking launcher.
+# Run from the repository root :  python api_src/tests/measure_worker_memory.py --workers 8
+
+MODES = {
+    "uvicorn": lambda workers, port: ["uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+    "preload": lambda workers, port: [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+}
+
+
+def wait_until_ready(port, workers, process, timeout):
+    # Ready once every worker is up and the root endpoint answers
+    start = time.time()
+    while time.time() - start < timeout:
+        children = [c for c in psutil.Process(process.pid).children(recursive=True) if "resource_tracker" not in " ".join(c.cmdline())]
+        if len(children) >= workers:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.time() - start
+            except httpx.HTTPError:
+                pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+
+def measure(mode, workers, port, settle, timeout):
+    process = subprocess.Popen(MODES[mode](workers, port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        startup = wait_until_ready(port, workers, process, timeout)
+        time.sleep(settle)
+
+        parent = psutil.Process(process.pid)
+        children = [c for c in parent.children(recursive=True) if "resource_tracker" not in " ".join(c.cmdline())]
+        workers_memory = [c.memory_full_info() for c in children]
+        parent_memory = parent.memory_full_info()
+
+        mib = 1024 * 1024
+        return {
+            "mode": mode,
+            "workers": len(children),
+            "startup_s": round(startup, 2),
+            "parent_rss_mib": round(parent_memory.rss / mib, 1),
+            "worker_rss_mib": round(sum(m.rss for m in workers_memory) / len(workers_memory) / mib, 1),
+            "worker_uss_mib": round(sum(m.uss for m in workers_memory) / len(workers_memory) / mib, 1),
+            "total_pss_mib": round((parent_memory.pss + sum(m.pss for m in workers_memory)) / mib, 1),
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker memory and startup time of the uvicorn and preload launchers.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait after startup before sampling")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    results = [measure(mode, args.workers, args.port, args.settle, args.timeout) for mode in MODES]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+# Import-time breakdown of the app and time until the server is alive and ready, per startup mode.
+# Run from the repository root :  python api_src/tests/startup_time.py --modes eager lazy
+
+
+def import_breakdown(mode, top):
+    """Import the app under `python -X importtime` and sum the self time of each top-level package."""
+    env = dict(os.environ, STARTUP_MODE=mode)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=env, capture_output=True, text=True)
+    packages = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:"):].split("|")
+        package = module.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        total += int(self_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"total_ms": round(total / 1000, 1), "packages_ms": {name: round(us / 1000, 1) for name, us in ranked}}
+
+
+def time_to_ready(mode, port, workers, timeout):
+    """Start the server and time the first successful /healthz and /readyz."""
+    env = dict(os.environ, STARTUP_MODE=mode)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    alive = ready = None
+    timings = None
+    try:
+        while time.perf_counter() - start < timeout and ready is None:
+            try:
+                if alive is None and httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                    alive = time.perf_counter() - start
+                response = httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1)
+                if response.status_code == 200:
+                    ready = time.perf_counter() - start
+                    timings = response.json()["timings_ms"]
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "alive_s": round(alive, 3) if alive is not None else None,
+        "ready_s": round(ready, 3) if ready is not None else None,
+        "startup_timings_ms": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time and the time to liveness and readiness of the API.")
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy"], choices=["eager", "lazy"])
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10, help="number of top-level packages listed in the breakdown")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    report = {}
+    for mode in args.modes:
+        report[mode] = {"import": import_breakdown(mode, args.top), **time_to_ready(mode, args.port, args.workers, args.timeout)}
+        print(f"{mode}: import app {report[mode]['import']['total_ms']} ms, "
+              f"alive after {report[mode]['alive_s']} s, ready after {report[mode]['ready_s']} s", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
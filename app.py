@@ -1,13 +1,28 @@
 import os
-import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import PlainTextResponse
-from api_src.config.settings import get_settings
-from api_src.logger.logger import get_logger
-from api_src.routers import router_predict 
+import asyncio
+from contextlib import asynccontextmanager
+from api_src.services.startup import get_startup_state, load_prediction_router, mark_ready
+startup = get_startup_state()
+with startup.phase("import_app"):
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.exception_handlers import http_exception_handler
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from starlette.exceptions import HTTPException as StarletteHTTPException
+    from api_src.config.settings import get_settings
+    from api_src.logger.logger import get_logger
+    from api_src.routers import router_health
+    from api_src.routers import router_metrics
+    from api_src.routers import router_models
+    from api_src.services.metrics import MetricsMiddleware, enable_metrics
+    from api_src.services.admission import AdmissionMiddleware
+    from api_src.services.registry import get_model_registry, watch_manifest
 settings = get_settings()
 logger = get_logger(__file__)
 
+# Paths of router_predict, known before it is imported in lazy startup mode
+PREDICTION_ENDPOINTS = ["/predict-all", "/predict-attack-cat", "/predict-attack", "/cache-stats", "/admission-stats"]
+
 
 ascii_art ="""
 
@@ -19,13 +34,70 @@ ascii_art ="""
                                                                                                               
 
 """
+async def load_models_in_background(app: FastAPI):
+    # Lazy startup mode : the server already answers /healthz while the models load in a thread
+    try:
+        router_predict = await asyncio.to_thread(load_prediction_router)
+    except Exception as e:
+        logger.error(f"Failed to load the models, the prediction endpoints stay unavailable : {e}")
+        return
+    app.include_router(router_predict.router)
+    app.openapi_schema = None
+    mark_ready()
+    if settings.model_reload_poll_s > 0:
+        await watch_manifest(get_model_registry(), settings.model_reload_poll_s)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker watches the manifest and hot-reloads the models it names
+    task = None
+    if settings.startup_mode == "lazy":
+        task = asyncio.create_task(load_models_in_background(app))
+    elif settings.model_reload_poll_s > 0:
+        task = asyncio.create_task(watch_manifest(get_model_registry(), settings.model_reload_poll_s))
+    yield
+    if task is not None:
+        task.cancel()
+
+
 app = FastAPI(
     title="AI API App SMARTSHIELD",
+    lifespan=lifespan,
 )
-app.include_router(router_predict.router)
+app.include_router(router_health.router)
+app.include_router(router_metrics.router)
+app.include_router(router_models.router)
+
+if settings.startup_mode == "eager":
+    # Import the heavy modules and load the models now, e.g. before serve.py forks the workers
+    app.include_router(load_prediction_router().router)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def not_ready_handler(request: Request, exc: StarletteHTTPException):
+    # Until the prediction router is included, its endpoints answer 503 instead of 404
+    if exc.status_code == 404 and request.url.path in PREDICTION_ENDPOINTS and startup.status != "ready":
+        return JSONResponse({"detail": "Models are not loaded yet."}, status_code=503, headers={"Retry-After": "1"})
+    return await http_exception_handler(request, exc)
+
+
+if settings.admission_enabled:
+    # Shed the requests of overloaded prediction endpoints with 429 before their upload is parsed
+    app.add_middleware(AdmissionMiddleware)
+
+if settings.metrics_enabled:
+    # Time each step of the prediction requests and expose them on /metrics
+    enable_metrics()
+    app.add_middleware(MetricsMiddleware, endpoints=PREDICTION_ENDPOINTS)
+
 logger.info(f"Starting App : \n {ascii_art}")
 
-logger.info("App Ready")
+if settings.startup_mode == "eager":
+    mark_ready()
+    logger.info("App Ready")
+else:
+    logger.info("App started, loading the models in the background")
 
 @app.get("/", response_class=PlainTextResponse)
 async def root():
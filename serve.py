@@ -0,0 +1,104 @@
+import argparse
+import gc
+import os
+import shutil
+import signal
+import tempfile
+import uvicorn
+from api_src.logger.logger import get_logger, stop_logging
+
+logger = get_logger(__file__)
+
+
+def spawn_worker(config: uvicorn.Config, sock) -> int:
+    """Fork a worker process serving the already loaded app on the shared socket.
+
+    Args:
+        config (uvicorn.Config): The uvicorn configuration holding the app object.
+        sock (socket.socket): The listening socket bound by the parent.
+
+    Returns:
+        int: The pid of the worker.
+    """
+    pid = os.fork()
+    if pid == 0:
+        # Child : the models loaded by the parent are shared copy-on-write
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            uvicorn.Server(config).run(sockets=[sock])
+        finally:
+            # os._exit skips atexit : write the queued log records first
+            stop_logging()
+            os._exit(0)
+
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load the models once, then fork uvicorn workers that share them copy-on-write."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    # Workers write their metrics to a shared directory, /metrics aggregates them
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    own_metrics_dir = not metrics_dir
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+    else:
+        metrics_dir = tempfile.mkdtemp(prefix="mlengine-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    from prometheus_client import multiprocess
+
+    # Importing the app loads both models in the parent process, unless STARTUP_MODE=lazy
+    # defers the loading to each worker : faster to start, but the models are not shared
+    from app import app
+
+    # Move every object loaded so far out of the GC's reach, so collections in the
+    # workers do not write to (and un-share) the pages holding them
+    gc.collect()
+    gc.freeze()
+
+    config = uvicorn.Config(app, host=args.host, port=args.port)
+    sock = config.bind_socket()
+    logger.info(f"Models loaded, forking {args.workers} workers on {args.host}:{args.port}")
+
+    workers = {spawn_worker(config, sock) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        pid, status = os.wait()
+        workers.discard(pid)
+        multiprocess.mark_process_dead(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting it")
+            workers.add(spawn_worker(config, sock))
+
+    sock.close()
+    if own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    logger.info("server Off")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+import src.features.UNSW_NB15_features.feature_engineering as fe
+from catboost import FeaturesData, Pool
+from src.utils.profiling import stage
+
+
+class FeaturePlan:
+    """
+    Compiled preprocessing plan for a fixed list of model features.
+
+    The plan is built once from the model's feature names and the lists in
+    feature_engineering.py. It computes the engineered ratio features, the log1p
+    columns and the category clamping in a single vectorized pass into a
+    preallocated float32 matrix and an int8 matrix of category codes, skipping the
+    intermediate pandas frames of Preprocessor.preprocess. The codes index the
+    clamped vocabularies in `categories`, and to_pool turns them back into the
+    strings CatBoost receives from Preprocessor.preprocess and Preprocessor.create_pool.
+
+    Attributes:
+        features (list): The model features, in model order.
+        categorical_features (list): The categorical features, in model order.
+        numerical_features (list): The numerical features, in model order.
+        input_features (list): The raw input columns the plan reads.
+        float32_input_features (list): The numerical input columns that can be read as float32 without changing the output.
+        allowed_categories (dict): The categories kept for each categorical feature.
+        categories (dict): The clamped vocabulary of each categorical feature, '-' included.
+        category_codes (dict): For each categorical feature, the code of each raw value kept, others map to '-'.
+
+    Methods:
+        transform: Compute the numerical and categorical feature matrices.
+        to_pool: Create a Pool object from the feature matrices, optionally projected on fewer features.
+        create_pool: Create a Pool object from the input dataframe.
+
+    """
+
+    def __init__(self, features : list, categorical_features : list = None):
+        """
+        Compile the plan for the given features.
+
+        Args:
+            features (list): The model features, in model order.
+            categorical_features (list): The categorical features. Defaults to proto, service and state.
+
+        Returns:
+            None
+
+        """
+        if categorical_features is None:
+            categorical_features = ['proto', 'service', 'state']
+
+        self.features = list(features)
+        self.categorical_features = [f for f in self.features if f in categorical_features]
+        self.numerical_features = [f for f in self.features if f not in categorical_features]
+        self.allowed_categories = fe.top_categories
+
+        # Clamped vocabulary of each categorical feature, '-' included, and the table
+        # from a raw value to its code in it : clamping becomes an integer gather
+        self.categories = {
+            feature: list(dict.fromkeys(list(self.allowed_categories[feature]) + ['-']))
+            for feature in self.categorical_features
+        }
+        self.category_codes = {
+            feature: {category: code for code, category in enumerate(categories)}
+            for feature, categories in self.categories.items()
+        }
+        self._category_values = {
+            feature: np.array(categories, dtype=object) for feature, categories in self.categories.items()
+        }
+
+        # One (kind, source) step per numerical output column
+        self._steps = []
+        for feature in self.numerical_features:
+            if feature in fe.engineered_features:
+                self._steps.append(('engineered', fe.engineered_features[feature]))
+            elif feature in fe.log_features:
+                self._steps.append(('log1p', feature))
+            else:
+                self._steps.append(('raw', feature))
+
+        input_features = [f for f in self.features if f not in fe.engineered_features]
+        derived = {source for kind, source in self._steps if kind == 'log1p'}
+        if any(kind == 'engineered' for kind, _ in self._steps):
+            input_features += [f for f in fe.engineered_input_features if f not in input_features]
+            derived.update(fe.engineered_input_features)
+        self.input_features = input_features
+
+        # Raw columns only copied into the float32 matrix : reading them as float32 gives the same matrix.
+        # The inputs of the log1p and engineered features keep their precision until those are computed.
+        self.float32_input_features = [
+            f for f in input_features if f in self.numerical_features and f not in derived
+        ]
+
+    def transform(self, df : pd.DataFrame):
+        """
+        Compute the numerical and categorical feature matrices.
+
+        Args:
+            df (pd.DataFrame): The input dataframe. It is not modified.
+
+        Returns:
+            num_data (np.ndarray): The float32 numerical features, shape (rows, numerical features).
+            cat_data (np.ndarray): The int8 codes of the clamped categories, shape (rows, categorical features).
+
+        """
+        rows = len(df)
+        with stage("preprocess.columns", rows=rows):
+            columns = {
+                feature: _to_numpy(df[feature])
+                for feature in self.input_features if feature not in self.categorical_features
+            }
+
+        with stage("preprocess.numerical", rows=rows):
+            num_data = np.empty((len(df), len(self.numerical_features)), dtype=np.float32)
+            for j, (kind, source) in enumerate(self._steps):
+                if kind == 'engineered':
+                    num_data[:, j] = source(columns)
+                elif kind == 'log1p':
+                    num_data[:, j] = np.log1p(columns[source].astype(float))
+                else:
+                    num_data[:, j] = columns[source]
+
+        with stage("preprocess.categorical", rows=rows):
+            cat_data = np.empty((len(df), len(self.categorical_features)), dtype=np.int8)
+            for j, feature in enumerate(self.categorical_features):
+                cat_data[:, j] = _encode(df[feature], self.category_codes[feature])
+
+        return num_data, cat_data
+
+    def to_pool(self, num_data : np.ndarray, cat_data : np.ndarray, features : list = None):
+        """
+        Create a Pool object from the feature matrices.
+
+        Args:
+            num_data (np.ndarray): The numerical features returned by transform.
+            cat_data (np.ndarray): The categorical features returned by transform.
+            features (list): A subset of the plan's features to keep. Defaults to all of them.
+
+        Returns:
+            Pool (Pool): The Pool object.
+
+        """
+        numerical_features = self.numerical_features
+        categorical_features = self.categorical_features
+        if features is not None and list(features) != self.features:
+            numerical_features = [f for f in self.numerical_features if f in features]
+            categorical_features = [f for f in self.categorical_features if f in features]
+            num_data = num_data[:, [self.numerical_features.index(f) for f in numerical_features]]
+            cat_data = cat_data[:, [self.categorical_features.index(f) for f in categorical_features]]
+
+        # The Python API only takes categories as strings : gather the shared string objects of each code
+        categories = np.empty(cat_data.shape, dtype=object)
+        for j, feature in enumerate(categorical_features):
+            categories[:, j] = self._category_values[feature][cat_data[:, j]]
+
+        return Pool(
+            data=FeaturesData(
+                num_feature_data=np.ascontiguousarray(num_data),
+                cat_feature_data=categories,
+                num_feature_names=numerical_features,
+                cat_feature_names=categorical_features,
+            )
+        )
+
+    def create_pool(self, df : pd.DataFrame):
+        """
+        Create a Pool object from the input dataframe.
+
+        Args:
+            df (pd.DataFrame): The input dataframe.
+
+        Returns:
+            Pool (Pool): The Pool object.
+
+        """
+        num_data, cat_data = self.transform(df)
+        return self.to_pool(num_data, cat_data)
+
+
+def _to_numpy(column : pd.Series):
+    """Return the column values as a numpy array, mapping nullable dtypes to float with NaN."""
+    if isinstance(column.dtype, np.dtype):
+        return column.to_numpy()
+    return column.to_numpy(dtype=float, na_value=np.nan)
+
+
+def _encode(column : pd.Series, category_codes : dict):
+    """Return the code of each value in the clamped vocabulary, values outside of it get the code of '-'."""
+    other = category_codes['-']
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Encode the (few) categories once, then gather through the codes
+        categories, codes = column.cat.categories, column.cat.codes.to_numpy()
+    else:
+        codes, categories = pd.factorize(column.to_numpy(dtype=object))
+    table = np.array([category_codes.get(category, other) for category in categories] + [other], dtype=np.int8)
+    return table[codes]  # code -1 (missing) indexes the trailing '-'
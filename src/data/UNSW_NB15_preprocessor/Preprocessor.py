@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
 import src.features.UNSW_NB15_features.feature_engineering as fe
+from src.data.UNSW_NB15_preprocessor.FeaturePlan import FeaturePlan
 from catboost import CatBoostClassifier, Pool
+from src.utils.profiling import stage
 import warnings
 
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -19,6 +21,7 @@ class Preprocessor:
         top_service_categories (list): The top service categories.
         top_state_categories (list): The top state categories.
         model_path (str): The path to the trained model.
+        plan (FeaturePlan): The compiled fast-path plan for the model's features.
 
     Methods:
         load_model_and_set_feature_names: Load the trained model and set the feature names.
@@ -29,6 +32,7 @@ class Preprocessor:
         create_log1p_features: Create log1p features for the selected columns.
         preprocess: Preprocess the input dataframe.
         create_pool: Create a Pool object from the input dataframe.
+        compile_plan: Compile a FeaturePlan for the fused NumPy fast path.
 
     """
 
@@ -43,9 +47,10 @@ class Preprocessor:
             None
 
         """
-        self.categorical_features = []
+        self.categorical_features = ['proto', 'service', 'state']
         self.numerical_features = []
         self.model = None
+        self.plan = None
         self.top_prop_categories = None
         self.top_service_categories = None
         self.top_state_categories = None
@@ -69,36 +74,43 @@ class Preprocessor:
         self.model = CatBoostClassifier()
         self.model.load_model(self.model_path)
         self.selected_features = self.model.feature_names_
+        self.numerical_features = [col for col in self.selected_features if col not in self.categorical_features]
+        self.plan = self.compile_plan()
 
-    def feature_selection(self, df : pd.DataFrame):
+    def feature_selection(self, df : pd.DataFrame, features : list = None):
         """
         Perform feature selection on the input dataframe.
 
+        The engineered features are computed into a new dataframe, so the
+        caller's dataframe is left untouched.
+
         Args:
             df (pd.DataFrame): The input dataframe.
+            features (list): The features to keep. Defaults to the model's feature names.
 
         Returns:
 
             df (pd.DataFrame): The dataframe with selected features.
 
         """
-        epsilon = 1e-10  # Small constant to avoid division by zero
+        engineered = {name: feature(df) for name, feature in fe.engineered_features.items()}
 
-        df["Speed of Operations to Speed of Data Bytes"] = np.log1p(df["sbytes"] / (df["dbytes"] + epsilon))
-        df["Time for a Single Process"] = np.log1p(df["dur"] / (df["spkts"] + epsilon))
-        df["Ratio of Data Flow"] = np.log1p(df["dbytes"] / (df["sbytes"] + epsilon))
-        df["Ratio of Packet Flow"] = np.log1p(df["dpkts"] / (df["spkts"] + epsilon))
-        df["Total Page Errors"] = np.log1p(df["dur"] * df["sloss"])
-        df["Network Usage"] = np.log1p(df["sbytes"] + df["dbytes"])
-        df["Network Activity Rate"] = np.log1p(df["spkts"] + df["dpkts"])
+        if features is None:
+            features = self.selected_features if hasattr(self, 'selected_features') else None
+        if features is None:
+            return df.assign(**engineered)
 
-        df = df[self.selected_features] if hasattr(self, 'selected_features') else df
-        return df
+        raw_features = [feature for feature in features if feature not in engineered]
+        df = pd.concat([df[raw_features], pd.DataFrame(engineered, index=df.index)], axis=1)
+        return df[features]
 
     def convert_data_types(self, df : pd.DataFrame):
         """
         Convert the data types of the columns in the input dataframe.
 
+        The numerical columns are computed per call rather than stored on the
+        instance, so the preprocessor can be shared between threads.
+
         Args:
             df (pd.DataFrame): The input dataframe.
 
@@ -106,11 +118,10 @@ class Preprocessor:
             df (pd.DataFrame): The dataframe with converted data types.
 
         """
-        self.categorical_features = ['proto', 'service', 'state']
-        self.numerical_features = [col for col in df.columns if col not in self.categorical_features]
+        numerical_features = [col for col in df.columns if col not in self.categorical_features]
         for column in self.categorical_features:
             df.loc[:, column] = df[column].astype('category')
-        for column in self.numerical_features:
+        for column in numerical_features:
             df.loc[:, column] = df[column].astype(float)
         return df
 
@@ -162,21 +173,27 @@ class Preprocessor:
                 df.loc[:, feature] = np.log1p(df[feature].astype(float)).astype('float32')
         return df
 
-    def preprocess(self, df: pd.DataFrame):
+    def preprocess(self, df: pd.DataFrame, features : list = None):
         """
         Preprocess the input dataframe.
 
         Args:
             df (pd.DataFrame): The input dataframe.
+            features (list): The features to keep. Defaults to the model's feature names.
 
         Returns:
             df (pd.DataFrame): The preprocessed dataframe.
 
         """
-        df = self.feature_selection(df)
-        df = self.transform_categories(df)
-        df = self.create_log1p_features(df)
-        df = self.convert_data_types(df)
+        rows = len(df)
+        with stage("preprocess.feature_selection", rows=rows):
+            df = self.feature_selection(df, features)
+        with stage("preprocess.transform_categories", rows=rows):
+            df = self.transform_categories(df)
+        with stage("preprocess.create_log1p_features", rows=rows):
+            df = self.create_log1p_features(df)
+        with stage("preprocess.convert_data_types", rows=rows):
+            df = self.convert_data_types(df)
         return df
 
     def create_pool(self, X : pd.DataFrame):
@@ -194,3 +211,18 @@ class Preprocessor:
             data=X,
             cat_features=self.categorical_features
         )
+
+    def compile_plan(self, features : list = None):
+        """
+        Compile a FeaturePlan for the fused NumPy fast path.
+
+        Args:
+            features (list): The features to compute. Defaults to the model's feature names.
+
+        Returns:
+            plan (FeaturePlan): The compiled plan.
+
+        """
+        if features is None:
+            features = self.selected_features
+        return FeaturePlan(features, self.categorical_features)
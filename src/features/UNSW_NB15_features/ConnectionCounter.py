@@ -0,0 +1,121 @@
+import threading
+import numpy as np
+import pandas as pd
+import src.features.UNSW_NB15_features.feature_engineering as fe
+
+
+class _WindowCounter:
+    """Counts of the keys among the last `window` keys pushed, updated in O(1) per key."""
+
+    def __init__(self, window : int):
+        self.window = window
+        self.ring = [None] * window
+        self.size = 0
+        self.position = 0
+        self.counts = {}
+
+    def push(self, keys : list):
+        ring, counts, window = self.ring, self.counts, self.window
+        position, size = self.position, self.size
+        out = []
+        append = out.append
+        for key in keys:
+            if size == window:
+                # Evict the key leaving the window
+                old = ring[position]
+                remaining = counts[old] - 1
+                if remaining:
+                    counts[old] = remaining
+                else:
+                    del counts[old]
+            else:
+                size += 1
+            ring[position] = key
+            position = position + 1 if position + 1 < window else 0
+            count = counts.get(key, 0) + 1
+            counts[key] = count
+            append(count)
+        self.position, self.size = position, size
+        return out
+
+
+class ConnectionCounter:
+    """
+    Stateful engine computing the UNSW-NB15 connection-count features of a stream of flows.
+
+    Each feature counts the flows sharing some raw fields (e.g. source address and
+    destination port for ct_src_dport_ltm) among the last `window` flows, the current
+    one included. The flows of successive batches continue the same stream, in the
+    order they are given, so a batch does not need the flows of the previous ones.
+    Each feature keeps a ring buffer of the last `window` keys and a count per key
+    present in it, so memory is bounded by the window and each flow is an O(1) update.
+
+    Calls are serialized, concurrent batches enter the stream one after the other.
+    Give each independent stream (e.g. each sensor) its own engine.
+
+    Attributes:
+        features (dict): The feature names mapped to the raw columns forming their key.
+        window (int): The number of most recent flows counted.
+        input_features (list): The raw columns read.
+
+    Methods:
+        transform: Add the connection-count features of a batch of flows.
+        reset: Forget the flows seen so far.
+
+    """
+    def __init__(self, features : dict = None, window : int = None):
+        """
+        Initialize the engine with empty windows.
+
+        Args:
+            features (dict): The feature names mapped to their key columns. Defaults to
+                connection_count_features of feature_engineering.py.
+            window (int): The number of most recent flows counted. Defaults to connection_window.
+
+        Returns:
+            None
+        """
+        self.features = dict(fe.connection_count_features if features is None else features)
+        self.window = fe.connection_window if window is None else window
+        self.input_features = list(dict.fromkeys(column for columns in self.features.values() for column in columns))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the flows seen so far.
+
+        Returns:
+            None
+        """
+        self._counters = {feature: _WindowCounter(self.window) for feature in self.features}
+
+    def transform(self, df : pd.DataFrame, overwrite : bool = True):
+        """
+        Add the connection-count features of a batch of flows, continuing the stream.
+
+        Args:
+            df (pd.DataFrame): The raw flows, in arrival order. It is not modified.
+            overwrite (bool): Recompute the features the dataframe already has. If False,
+                they are kept and the flows still enter the windows.
+
+        Returns:
+            df (pd.DataFrame): A copy of the dataframe with the connection-count features.
+
+        """
+        missing = [column for column in self.input_features if column not in df.columns]
+        if missing:
+            raise KeyError(f"Missing columns for the connection-count features: {missing}")
+
+        columns = {}
+        with self._lock:
+            for feature, key_columns in self.features.items():
+                if len(key_columns) == 1:
+                    keys = df[key_columns[0]].tolist()
+                else:
+                    keys = list(zip(*(df[column].tolist() for column in key_columns)))
+                counts = np.array(self._counters[feature].push(keys), dtype=np.int64)
+                if overwrite or feature not in df.columns:
+                    columns[feature] = counts
+
+        return df.assign(**columns)
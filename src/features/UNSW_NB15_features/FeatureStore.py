@@ -0,0 +1,142 @@
+import hashlib
+import inspect
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import src.features.UNSW_NB15_features.feature_engineering as fe
+import src.data.UNSW_NB15_preprocessor.Preprocessor as preprocessor_module
+from src.utils.hashing import file_digest
+
+
+class FeatureStore:
+    """
+    On-disk cache of preprocessed frames, addressed by the content they are computed from.
+
+    The key of a frame hashes the input files, the source of feature_engineering.py and
+    of the Preprocessor (their constants, categories and feature formulas), the selected
+    features and any other parameter of the computation, so a change to any of them
+    computes a new frame and a stale one is never read. Frames are written once, as
+    uncompressed Arrow IPC files, and read back memory-mapped : a hit costs no
+    preprocessing and no decoding, the numerical columns are views of the file.
+
+    Attributes:
+        directory (str): Where the frames are written.
+        hits (int): The frames read from the store.
+        misses (int): The frames computed and written.
+
+    Methods:
+        key: Hash what a frame is computed from.
+        load: Read a frame, memory-mapped.
+        save: Write a frame.
+        get_or_build: Read a frame, computing and writing it on a miss.
+
+    """
+    def __init__(self, directory : str = "data/UNSW_NB15_data/feature_store"):
+        """
+        Initialize the store, its directory is created on the first write.
+
+        Args:
+            directory (str): Where the frames are written.
+
+        Returns:
+            None
+        """
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}
+
+    def _data_digest(self, path : str):
+        # Files are hashed once per (size, mtime), re-reading a training set per key is not free
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if signature not in self._digests:
+            self._digests[signature] = file_digest(path)
+        return self._digests[signature]
+
+    def key(self, data_paths : list, features : list, **params):
+        """
+        Hash what a frame is computed from.
+
+        Args:
+            data_paths (list): The input files.
+            features (list): The selected features, in order.
+            **params: Any other JSON-serializable parameter of the computation.
+
+        Returns:
+            key (str): The sha256 hex digest.
+        """
+        content = {
+            "data": [self._data_digest(path) for path in data_paths],
+            "code": [hashlib.sha256(inspect.getsource(module).encode()).hexdigest() for module in (fe, preprocessor_module)],
+            "features": list(features),
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, key : str):
+        """The file of a key."""
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def load(self, key : str):
+        """
+        Read a frame, memory-mapped.
+
+        Args:
+            key (str): The key of the frame.
+
+        Returns:
+            df (pd.DataFrame): The frame, or None if the store does not hold it. Its numerical columns are read-only.
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path) as source:
+            table = ipc.open_file(source).read_all()
+        # split_blocks keeps each column a zero-copy view of the mapped file
+        return table.to_pandas(split_blocks=True)
+
+    def save(self, key : str, df : pd.DataFrame):
+        """
+        Write a frame, atomically so a concurrent run never reads half of it.
+
+        Args:
+            key (str): The key of the frame.
+            df (pd.DataFrame): The frame. Its index is not kept.
+
+        Returns:
+            path (str): The file written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+        return path
+
+    def get_or_build(self, data_paths : list, features : list, build, **params):
+        """
+        Read a frame, computing and writing it on a miss.
+
+        Args:
+            data_paths (list): The input files.
+            features (list): The selected features, in order.
+            build (Callable): Computes the frame when the store does not hold it.
+            **params: Any other JSON-serializable parameter of the computation.
+
+        Returns:
+            df (pd.DataFrame): The frame, memory-mapped from the store.
+            key (str): Its key.
+        """
+        key = self.key(data_paths, features, **params)
+        df = self.load(key)
+        if df is not None:
+            self.hits += 1
+            return df, key
+        self.misses += 1
+        self.save(key, build())
+        return self.load(key), key
@@ -1,4 +1,38 @@
+import numpy as np
+
 top_prop_categories = ['tcp', 'udp', 'unas', 'arp', 'ospf', 'sctp']
 top_service_categories = ['-', 'dns', 'http', 'smtp', 'ftp-data', 'ftp', 'ssh', 'pop3']
 top_state_categories = ['INT', 'FIN', 'CON', 'REQ', 'RST']
+top_categories = {
+    'proto': top_prop_categories,
+    'service': top_service_categories,
+    'state': top_state_categories,
+}
 log_features = ['smean', 'dmean', 'sinpkt', 'dinpkt', 'sload', 'dload', 'sbytes', 'dbytes', 'sjit', 'djit']
+
+epsilon = 1e-10  # Small constant to avoid division by zero
+
+# Engineered features, computed from the raw columns of a dataframe or a dict of arrays
+engineered_features = {
+    "Speed of Operations to Speed of Data Bytes": lambda df: np.log1p(df["sbytes"] / (df["dbytes"] + epsilon)),
+    "Time for a Single Process": lambda df: np.log1p(df["dur"] / (df["spkts"] + epsilon)),
+    "Ratio of Data Flow": lambda df: np.log1p(df["dbytes"] / (df["sbytes"] + epsilon)),
+    "Ratio of Packet Flow": lambda df: np.log1p(df["dpkts"] / (df["spkts"] + epsilon)),
+    "Total Page Errors": lambda df: np.log1p(df["dur"] * df["sloss"]),
+    "Network Usage": lambda df: np.log1p(df["sbytes"] + df["dbytes"]),
+    "Network Activity Rate": lambda df: np.log1p(df["spkts"] + df["dpkts"]),
+}
+engineered_input_features = ['sbytes', 'dbytes', 'dur', 'spkts', 'dpkts', 'sloss']
+
+# Connection-count features : number of flows sharing these raw fields among the last
+# `connection_window` flows, the current one included (UNSW-NB15 definitions)
+connection_count_features = {
+    'ct_srv_src': ['service', 'srcip'],
+    'ct_srv_dst': ['service', 'dstip'],
+    'ct_dst_ltm': ['dstip'],
+    'ct_src_ltm': ['srcip'],
+    'ct_src_dport_ltm': ['srcip', 'dsport'],
+    'ct_dst_sport_ltm': ['dstip', 'sport'],
+    'ct_dst_src_ltm': ['srcip', 'dstip'],
+}
+connection_window = 100
@@ -1,4 +1,6 @@
 from src.data.UNSW_NB15_preprocessor.Preprocessor import Preprocessor
+from src.models.UNSW_NB15_models.InferenceBackend import create_backend
+from src.utils.profiling import stage
 import pandas as pd
 
 
@@ -11,59 +13,70 @@ class ClassificationModel:
         model_path (str): The path to the trained model.
         preprocessor (Preprocessor): The preprocessor object.
         model (CatBoostClassifier): The trained CatBoost model.
+        backend (InferenceBackend): The engine evaluating the trees.
 
     Methods:
         predict: Make predictions using the trained CatBoost model.
 
     """
-    def __init__(self):
+    def __init__(self, backend : str = "catboost", model_path : str = None):
         """
         Initialize the CatModel with the path to the input data.
 
         Args:
-            None
+            backend (str): The inference backend, "catboost" or "numpy".
+            model_path (str): The path to the trained model. Defaults to the version shipped with the repository.
 
         Returns:
             None
         """
-        self.model_path = "models/UNSW_NB15_models/classification_model_84_F1_V2.cbm"
+        self.model_path = model_path or "models/UNSW_NB15_models/classification_model_84_F1_V2.cbm"
         self.preprocessor = Preprocessor(self.model_path)
         self.model = self.preprocessor.model
+        self.backend = create_backend(backend, self.model)
 
-    def predict(self, df : pd.DataFrame):
+    def predict(self, df : pd.DataFrame, thread_count : int = -1):
         """
         Make predictions using the trained CatBoost model.
 
         Args:
-            data_path (str): The path to the input data.
+            df (pd.DataFrame): The input data.
+            thread_count (int): The number of threads CatBoost uses for this call. -1 uses all cores.
 
         Returns:
             predictions (np.array): The predicted attack categories.
 
         """
-        # Preprocess the input data
-        df = self.preprocessor.preprocess(df)
-        df = self.preprocessor.create_pool(df)
+        # Preprocess the input data with the compiled fast path
+        plan = self.preprocessor.plan
+        num_data, cat_data = plan.transform(df)
+        with stage("prepare", model="classification", rows=len(df)):
+            prepared = self.backend.prepare(plan, num_data, cat_data)
 
         # Make predictions
-        predictions = self.model.predict(df)
+        with stage("predict", model="classification", rows=len(df)):
+            predictions = self.backend.predict(prepared, thread_count=thread_count)
         return predictions
 
-    def predict_proba(self, df : pd.DataFrame):
+    def predict_proba(self, df : pd.DataFrame, thread_count : int = -1):
         """
         Make predictions using the trained CatBoost model.
 
         Args:
             df (pd.DataFrame): The input data.
+            thread_count (int): The number of threads CatBoost uses for this call. -1 uses all cores.
 
         Returns:
             predictions (np.array): The predicted attack categories.
 
         """
-        # Preprocess the input data
-        df = self.preprocessor.preprocess(df)
-        df = self.preprocessor.create_pool(df)
+        # Preprocess the input data with the compiled fast path
+        plan = self.preprocessor.plan
+        num_data, cat_data = plan.transform(df)
+        with stage("prepare", model="classification", rows=len(df)):
+            prepared = self.backend.prepare(plan, num_data, cat_data)
 
         # Make predictions
-        predictions = self.model.predict_proba(df)
+        with stage("predict_proba", model="classification", rows=len(df)):
+            predictions = self.backend.predict_proba(prepared, thread_count=thread_count)
         return predictions
\ No newline at end of file
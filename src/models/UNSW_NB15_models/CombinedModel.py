@@ -0,0 +1,149 @@
+from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from src.utils.profiling import stage
+import numpy as np
+import pandas as pd
+
+
+class CombinedModel:
+    """
+    Runs the detection and classification models on a single preprocessing pass.
+
+    The input dataframe is preprocessed once for the union of both models' features.
+    When both models expect the same features and use the same backend, a single
+    backend input (e.g. one Pool) is built and shared, otherwise each model gets its
+    own projection of the shared feature matrices.
+
+    In cascade mode, the classification model only scores the rows the detection
+    model flags as attacks, the other rows get an empty category. The detection can
+    use a probability threshold instead of the model's default decision.
+
+    Attributes:
+        detection_model (DetectionModel): The attack detection model.
+        classification_model (ClassificationModel): The attack category model.
+        preprocessor (Preprocessor): The preprocessor used for the shared pass.
+        plan (FeaturePlan): The compiled plan for the union of both models' features.
+        detection_features (list): The detection model's feature names.
+        classification_features (list): The classification model's feature names.
+        features (list): The union of both models' feature names.
+        shared_input (bool): Whether both models can be fed the same backend input.
+        cascade (bool): Whether to classify only the rows flagged by the detection model.
+        threshold (float): The detection probability from which a row is flagged. None uses the model's decision.
+
+    Methods:
+        transform: Compute the feature matrices once for both models.
+        detect: Make detection predictions from a prepared detection input.
+        predict: Make detection and classification predictions.
+
+    """
+    def __init__(self, detection_model : DetectionModel, classification_model : ClassificationModel, cascade : bool = False, threshold : float = None):
+        """
+        Initialize the CombinedModel with already loaded models.
+
+        Args:
+            detection_model (DetectionModel): The attack detection model.
+            classification_model (ClassificationModel): The attack category model.
+            cascade (bool): Classify only the rows flagged by the detection model.
+            threshold (float): The detection probability from which a row is flagged. None uses the model's decision.
+
+        Returns:
+            None
+        """
+        self.detection_model = detection_model
+        self.classification_model = classification_model
+        self.cascade = cascade
+        self.threshold = threshold
+        self.preprocessor = detection_model.preprocessor
+
+        detection_features = list(detection_model.model.feature_names_)
+        classification_features = list(classification_model.model.feature_names_)
+        self.detection_features = detection_features
+        self.classification_features = classification_features
+        self.shared_input = (
+            detection_features == classification_features
+            and type(detection_model.backend) is type(classification_model.backend)
+        )
+        self.features = detection_features + [
+            feature for feature in classification_features if feature not in detection_features
+        ]
+        self.plan = self.preprocessor.compile_plan(self.features)
+
+    def transform(self, df : pd.DataFrame):
+        """
+        Compute the feature matrices once for both models.
+
+        Args:
+            df (pd.DataFrame): The input data.
+
+        Returns:
+            num_data (np.ndarray): The float32 numerical features for the union of both models' features.
+            cat_data (np.ndarray): The clamped categorical features.
+
+        """
+        return self.plan.transform(df)
+
+    def detect(self, detection_input, thread_count : int = -1):
+        """
+        Make detection predictions, applying the threshold if one is set.
+
+        Args:
+            detection_input: The detection model's backend input.
+            thread_count (int): The number of threads CatBoost uses for this call. -1 uses all cores.
+
+        Returns:
+            predictions (np.array): The detection predictions.
+
+        """
+        backend = self.detection_model.backend
+        if self.threshold is None:
+            return backend.predict(detection_input, thread_count=thread_count)
+        probabilities = backend.predict_proba(detection_input, thread_count=thread_count)[:, 1]
+        return np.where(probabilities >= self.threshold, backend.classes[1], backend.classes[0])
+
+    def predict(self, df : pd.DataFrame, thread_count : int = -1):
+        """
+        Make detection and classification predictions on the same input data.
+
+        Args:
+            df (pd.DataFrame): The input data.
+            thread_count (int): The number of threads CatBoost uses for this call. -1 uses all cores.
+
+        Returns:
+            predictions (tuple): The detection predictions and the predicted attack categories.
+                In cascade mode, the rows not flagged as attacks get an empty category.
+
+        """
+        num_data, cat_data = self.transform(df)
+
+        detection_backend = self.detection_model.backend
+        classification_backend = self.classification_model.backend
+
+        rows = len(df)
+        with stage("prepare", model="detection", rows=rows):
+            detection_input = detection_backend.prepare(self.plan, num_data, cat_data)
+
+        if self.cascade:
+            with stage("predict", model="detection", rows=rows):
+                detection_predictions = self.detect(detection_input, thread_count=thread_count)
+
+            # Only the flagged rows go through the classification model
+            flagged = np.flatnonzero(detection_predictions != detection_backend.classes[0])
+            classification_predictions = np.full((rows, 1), "", dtype=object)
+            if len(flagged):
+                with stage("prepare", model="classification", rows=len(flagged)):
+                    classification_input = classification_backend.prepare(self.plan, num_data[flagged], cat_data[flagged])
+                with stage("predict", model="classification", rows=len(flagged)):
+                    classification_predictions[flagged] = classification_backend.predict(classification_input, thread_count=thread_count)
+            return detection_predictions, classification_predictions
+
+        if self.shared_input:
+            classification_input = detection_input
+        else:
+            with stage("prepare", model="classification", rows=rows):
+                classification_input = classification_backend.prepare(self.plan, num_data, cat_data)
+
+        with stage("predict", model="detection", rows=rows):
+            detection_predictions = self.detect(detection_input, thread_count=thread_count)
+        with stage("predict", model="classification", rows=rows):
+            classification_predictions = classification_backend.predict(classification_input, thread_count=thread_count)
+        return detection_predictions, classification_predictions
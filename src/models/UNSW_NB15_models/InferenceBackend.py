@@ -0,0 +1,275 @@
+import itertools
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+import numpy as np
+from catboost import CatBoostClassifier, FeaturesData, Pool
+from src.data.UNSW_NB15_preprocessor.FeaturePlan import FeaturePlan
+import src.features.UNSW_NB15_features.feature_engineering as fe
+
+
+class InferenceBackend(ABC):
+    """
+    Interface between the models and the engine evaluating the trees.
+
+    A backend scores the feature matrices computed by a FeaturePlan. Scoring is
+    split in two steps so that an input prepared once can be shared by several
+    calls, e.g. predict and predict_proba, or two models with the same features.
+
+    Attributes:
+        model (CatBoostClassifier): The trained CatBoost model.
+        features (list): The model's feature names.
+        classes (np.ndarray): The class labels.
+
+    Methods:
+        prepare: Convert the plan's feature matrices into the backend input.
+        predict: Predict the class labels of a prepared input.
+        predict_proba: Predict the class probabilities of a prepared input.
+
+    """
+    name = None
+
+    def __init__(self, model : CatBoostClassifier):
+        """
+        Initialize the backend with a loaded CatBoost model.
+
+        Args:
+            model (CatBoostClassifier): The trained CatBoost model.
+
+        Returns:
+            None
+        """
+        self.model = model
+        self.features = list(model.feature_names_)
+        self.classes = np.asarray(model.classes_)
+
+    @abstractmethod
+    def prepare(self, plan : FeaturePlan, num_data : np.ndarray, cat_data : np.ndarray):
+        """Convert the plan's feature matrices into the backend input."""
+
+    @abstractmethod
+    def predict(self, prepared, thread_count : int = -1):
+        """Predict the class labels of a prepared input."""
+
+    @abstractmethod
+    def predict_proba(self, prepared, thread_count : int = -1):
+        """Predict the class probabilities of a prepared input."""
+
+
+class CatBoostBackend(InferenceBackend):
+    """
+    Backend scoring with CatBoostClassifier on a Pool.
+    """
+    name = "catboost"
+
+    def prepare(self, plan : FeaturePlan, num_data : np.ndarray, cat_data : np.ndarray):
+        return plan.to_pool(num_data, cat_data, self.features)
+
+    def predict(self, prepared : Pool, thread_count : int = -1):
+        return self.model.predict(prepared, thread_count=thread_count)
+
+    def predict_proba(self, prepared : Pool, thread_count : int = -1):
+        return self.model.predict_proba(prepared, thread_count=thread_count)
+
+
+class NumpyTreeBackend(InferenceBackend):
+    """
+    Backend evaluating the oblivious-tree ensemble with vectorized NumPy lookups.
+
+    The model is exported with CatBoost's JSON format into flat arrays. Each distinct
+    float split (feature, border) is evaluated once per row, then the leaf index of
+    every tree is assembled from the bits of its splits, one depth level at a time.
+    All intermediate arrays are tree-major, (trees, rows), so that each lookup is a
+    contiguous row gather. The leaf values are gathered from a flat table per output
+    dimension and summed over the trees.
+
+    Splits on categorical features (one-hot and CTR splits) only depend on the
+    clamped categories, which take a handful of values. Their bits are computed
+    once at load time for every combination of categories, by asking CatBoost for
+    the leaf indexes of synthetic rows, and looked up per row at inference.
+
+    Attributes:
+        float_features (list): The float feature names, in CatBoost float index order.
+        cat_features (list): The categorical feature names, in CatBoost categorical index order.
+        categories (dict): The possible values of each categorical feature.
+        chunk_rows (int): The number of rows evaluated at once, bounding the temporary arrays.
+
+    """
+    name = "numpy"
+
+    def __init__(self, model : CatBoostClassifier, categories : dict = None, chunk_rows : int = 4096):
+        """
+        Export the model into flat NumPy arrays.
+
+        Args:
+            model (CatBoostClassifier): The trained CatBoost model.
+            categories (dict): The possible values of each categorical feature. Defaults to
+                the clamped categories of feature_engineering.py.
+            chunk_rows (int): The number of rows evaluated at once.
+
+        Returns:
+            None
+        """
+        super().__init__(model)
+        self.chunk_rows = chunk_rows
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.json")
+            model.save_model(path, format="json")
+            with open(path) as f:
+                exported = json.load(f)
+
+        features_info = exported["features_info"]
+        float_info = sorted(features_info.get("float_features", []), key=lambda f: f["feature_index"])
+        cat_info = sorted(features_info.get("categorical_features", []), key=lambda f: f["feature_index"])
+        self.float_features = [f["feature_id"] for f in float_info]
+        self.cat_features = [f["feature_id"] for f in cat_info]
+
+        for ctr in features_info.get("ctrs", []):
+            if any(element["combination_element"] != "cat_feature_value" for element in ctr["elements"]):
+                raise ValueError("NumpyTreeBackend only supports CTRs built from categorical features")
+
+        if categories is None:
+            categories = {feature: list(dict.fromkeys(allowed + ['-'])) for feature, allowed in fe.top_categories.items()}
+        self.categories = {feature: list(categories[feature]) for feature in self.cat_features}
+        self._category_codes = {
+            feature: {category: code for code, category in enumerate(self.categories[feature])}
+            for feature in self.cat_features
+        }
+
+        trees = exported["oblivious_trees"]
+        n_trees = len(trees)
+        depth = max(len(tree["splits"]) for tree in trees)
+        n_leaves = 1 << depth
+        dimension = len(trees[0]["leaf_values"]) // (1 << len(trees[0]["splits"]))
+        nan_true = [f.get("nan_value_treatment") == "AsTrue" for f in float_info]
+
+        # Distinct float splits, and for each depth and tree the split it uses. Categorical
+        # splits and the padding of shallower trees point to an extra split that is always 0.
+        splits = {}
+        split_index = []
+        leaf_values = np.zeros((n_trees, n_leaves, dimension), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            tree_index = []
+            for split in tree["splits"]:
+                if split["split_type"] == "FloatFeature":
+                    key = (split["float_feature_index"], np.float32(split["border"]))
+                    tree_index.append(splits.setdefault(key, len(splits)))
+                elif split["split_type"] in ("OnlineCtr", "OneHotFeature"):
+                    tree_index.append(-1)
+                else:
+                    raise ValueError(f"NumpyTreeBackend does not support {split['split_type']} splits")
+            split_index.append(tree_index + [-1] * (depth - len(tree_index)))
+            leaves = np.asarray(tree["leaf_values"], dtype=np.float64).reshape(-1, dimension)
+            leaf_values[t, :len(leaves)] = leaves
+
+        self.split_features = np.array([feature for feature, _ in splits], dtype=np.int64)
+        self.split_borders = np.array([border for _, border in splits], dtype=np.float32)[:, None]
+        self.split_nan_true = np.array([nan_true[feature] for feature, _ in splits], dtype=bool)[:, None]
+        split_index = np.array(split_index, dtype=np.int64).T
+        self.split_index = np.where(split_index < 0, len(splits), split_index)
+        self._leaf_dtype = np.uint8 if depth <= 8 else np.int64
+
+        scale, bias = exported.get("scale_and_bias", [1, [0] * dimension])
+        self.leaf_values = np.ascontiguousarray((leaf_values * scale).reshape(n_trees * n_leaves, dimension).T)
+        self.bias = np.asarray(bias, dtype=np.float64).reshape(-1)
+        self._tree_offsets = (np.arange(n_trees, dtype=np.int64) * n_leaves)[:, None]
+
+        self.cat_leaf_offsets = self._categorical_leaf_offsets()
+
+    def _categorical_leaf_offsets(self):
+        """Compute the categorical split bits of every tree for every combination of categories."""
+        n_trees = self.split_index.shape[1]
+        if not self.cat_features:
+            return np.zeros((n_trees, 1), dtype=np.int64)
+
+        combinations = list(itertools.product(*(self.categories[f] for f in self.cat_features)))
+        num_data = np.zeros((len(combinations), len(self.float_features)), dtype=np.float32)
+        pool = Pool(
+            data=FeaturesData(
+                num_feature_data=num_data,
+                cat_feature_data=np.array(combinations, dtype=object),
+                num_feature_names=self.float_features,
+                cat_feature_names=self.cat_features,
+            )
+        )
+        leaf_indexes = self.model.calc_leaf_indexes(pool).astype(np.int64).T
+
+        # The leaf index is the sum of the split bits, remove the float part of the zero rows
+        return np.ascontiguousarray(leaf_indexes - self._float_leaf_indexes(num_data[:1]))
+
+    def _float_leaf_indexes(self, X : np.ndarray):
+        """Compute the float part of the leaf indexes, shape (trees, rows)."""
+        values = np.ascontiguousarray(X.T)[self.split_features]
+        bits = values > self.split_borders
+        nans = np.isnan(values)
+        if nans.any():
+            bits = np.where(nans, self.split_nan_true, bits)
+        bits = np.concatenate([bits, np.zeros((1, len(X)), dtype=bool)]).astype(self._leaf_dtype)
+
+        leaf = np.zeros((self.split_index.shape[1], len(X)), dtype=self._leaf_dtype)
+        for d, split_index in enumerate(self.split_index):
+            leaf |= bits[split_index] << d
+        return leaf
+
+    def prepare(self, plan : FeaturePlan, num_data : np.ndarray, cat_data : np.ndarray):
+        X = num_data[:, [plan.numerical_features.index(f) for f in self.float_features]]
+
+        combination = np.zeros(len(num_data), dtype=np.int64)
+        for feature in self.cat_features:
+            category_codes = self._category_codes[feature]
+            # Map the plan's codes to this backend's, categories it does not know are scored as '-'
+            remap = np.array([category_codes.get(category, category_codes['-']) for category in plan.categories[feature]], dtype=np.int64)
+            combination = combination * len(category_codes) + remap[cat_data[:, plan.categorical_features.index(feature)]]
+        return X, combination
+
+    def raw_formula_val(self, prepared):
+        """Compute the raw scores of a prepared input, shape (rows, dimension)."""
+        X, combination = prepared
+        raw = np.empty((len(X), len(self.leaf_values)), dtype=np.float64)
+        for start in range(0, len(X), self.chunk_rows):
+            stop = start + self.chunk_rows
+            leaf = self._float_leaf_indexes(X[start:stop]) + self.cat_leaf_offsets[:, combination[start:stop]]
+            leaf += self._tree_offsets
+            for k, leaf_values in enumerate(self.leaf_values):
+                raw[start:stop, k] = np.take(leaf_values, leaf).sum(axis=0)
+        return raw + self.bias
+
+    def predict_proba(self, prepared, thread_count : int = -1):
+        raw = self.raw_formula_val(prepared)
+        if raw.shape[1] == 1:
+            probability = 1 / (1 + np.exp(-raw[:, 0]))
+            return np.column_stack([1 - probability, probability])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, prepared, thread_count : int = -1):
+        raw = self.raw_formula_val(prepared)
+        if raw.shape[1] == 1:
+            return self.classes[(raw[:, 0] > 0).astype(int)]
+        return self.classes[np.argmax(raw, axis=1)].reshape(-1, 1)
+
+
+backends = {
+    CatBoostBackend.name: CatBoostBackend,
+    NumpyTreeBackend.name: NumpyTreeBackend,
+}
+
+
+def create_backend(name : str, model : CatBoostClassifier):
+    """
+    Create the inference backend called `name` for a loaded model.
+
+    Args:
+        name (str): The backend name, "catboost" or "numpy".
+        model (CatBoostClassifier): The trained CatBoost model.
+
+    Returns:
+        backend (InferenceBackend): The backend.
+
+    """
+    if name not in backends:
+        raise ValueError(f"Unknown inference backend: {name}. Expected one of {list(backends)}")
+    return backends[name](model)
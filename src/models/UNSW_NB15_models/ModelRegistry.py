@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import src.features.UNSW_NB15_features.feature_engineering as fe
+from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from src.models.UNSW_NB15_models.CombinedModel import CombinedModel
+from src.utils.hashing import file_digest
+
+
+@dataclass(eq=False)
+class ModelSet:
+    """The models served together, swapped as a whole."""
+    detection: DetectionModel
+    classification: ClassificationModel
+    combined: CombinedModel
+    versions: dict
+    loaded_at: float
+    load_ms: dict
+    warmup_ms: float
+    in_flight: int = field(default=0)
+
+
+def warmup_batch(plan, rows : int):
+    """
+    Synthesize raw flows covering the categories and a range of magnitudes of each input feature.
+
+    Args:
+        plan (FeaturePlan): The plan whose input features are synthesized.
+        rows (int): The number of flows.
+
+    Returns:
+        df (pd.DataFrame): The synthetic flows.
+    """
+    positions = np.arange(rows)
+    columns = {}
+    for feature in plan.input_features:
+        if feature in plan.categorical_features:
+            # The kept categories, then one the clamping maps to "-"
+            categories = list(fe.top_categories.get(feature, [])) + ["unseen"]
+            columns[feature] = np.array(categories, dtype=object)[positions % len(categories)]
+        else:
+            columns[feature] = (10.0 ** (positions % 7) - 1).astype(np.float64)
+    return pd.DataFrame(columns)
+
+
+class ModelRegistry:
+    """
+    Loads the models by version from a manifest and swaps new versions in while requests run.
+
+    The manifest maps each model ("detection", "classification") to its versions and
+    the active one:
+
+        {"detection": {"active": "94_recall_V2",
+                       "versions": {"94_recall_V2": {"path": "detection_model_94_recall_V2.cbm", "sha256": "..."}}}}
+
+    Paths are relative to the manifest, the optional sha256 is checked on load. A load
+    builds a new ModelSet, loading the models whose version changed in parallel, runs each
+    model on a synthetic batch so the first requests do not pay for the lazy
+    initialisations, then replaces the active set in one assignment. Callers score
+    through `lease`, which pins the set active when the call starts : a swap never
+    affects a call in progress, and the previous set is released once its last call
+    returns.
+
+    Attributes:
+        manifest_path (str): The path to the manifest.
+        backend (str): The inference backend of the loaded models.
+        cascade (bool): The cascade mode of the combined model.
+        threshold (float): The detection threshold of the combined model.
+        warmup_rows (int): The size of the warm-up batch. 0 disables the warm-up.
+        active (ModelSet): The models currently served.
+        last_error (str): Why the last load failed, None once a load succeeds.
+
+    Methods:
+        read_manifest: Read the active version and path of each model.
+        load: Load the active versions of the manifest and swap them in.
+        reload: Load the manifest again, reporting whether other versions are served.
+        manifest_changed: Whether the manifest changed since it was last loaded.
+        lease: Pin the active models for the duration of a call.
+        add_listener: Register a callback run after each swap.
+        status: Describe the served and draining versions.
+
+    """
+    def __init__(self, manifest_path : str, backend : str = "catboost", cascade : bool = False, threshold : float = None, warmup_rows : int = 256):
+        """
+        Initialize an empty registry, `load` loads the models.
+
+        Args:
+            manifest_path (str): The path to the manifest.
+            backend (str): The inference backend, "catboost" or "numpy".
+            cascade (bool): Classify only the rows flagged by the detection model in the combined model.
+            threshold (float): The detection probability from which the combined model flags a row.
+            warmup_rows (int): The size of the warm-up batch. 0 disables the warm-up.
+
+        Returns:
+            None
+        """
+        self.manifest_path = manifest_path
+        self.backend = backend
+        self.cascade = cascade
+        self.threshold = threshold
+        self.warmup_rows = warmup_rows
+        self.active = None
+        self._draining = []
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._manifest_mtime = None
+        self.last_error = None
+
+    def read_manifest(self):
+        """
+        Read the active version and path of each model.
+
+        Returns:
+            entries (dict): For each model, its active version, path and expected sha256 (or None).
+        """
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+
+        base = os.path.dirname(self.manifest_path)
+        entries = {}
+        for name in ("detection", "classification"):
+            if name not in manifest:
+                raise ValueError(f"{self.manifest_path} has no entry for the {name} model")
+            version = manifest[name]["active"]
+            if version not in manifest[name]["versions"]:
+                raise ValueError(f"{self.manifest_path} : active {name} version {version!r} is not listed")
+            entry = manifest[name]["versions"][version]
+            entries[name] = {
+                "version": version,
+                "path": os.path.join(base, entry["path"]),
+                "sha256": entry.get("sha256"),
+            }
+        return entries
+
+    def _load_model(self, model_class, entry : dict):
+        if entry["sha256"] is not None and file_digest(entry["path"]) != entry["sha256"]:
+            raise ValueError(f"{entry['path']} does not match the sha256 of version {entry['version']!r}")
+        return model_class(backend=self.backend, model_path=entry["path"])
+
+    def _warm_up(self, models : ModelSet):
+        # Single rows and a full batch through every path the API calls
+        batch = warmup_batch(models.combined.plan, self.warmup_rows)
+        for df in (batch.iloc[:1], batch):
+            models.detection.predict(df)
+            models.detection.predict_proba(df)
+            models.classification.predict(df)
+            models.combined.predict(df)
+
+    def load(self):
+        """
+        Load the active versions of the manifest, warm them up and swap them in.
+
+        The served models are unchanged if anything fails.
+
+        Returns:
+            active (ModelSet): The models now served.
+        """
+        with self._load_lock:
+            # A manifest that fails to load is not retried until it changes again
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            try:
+                models = self._load()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_error = None
+            return models
+
+    def _load(self):
+        entries = self.read_manifest()
+        versions = {name: entry["version"] for name, entry in entries.items()}
+        current = self.active
+        if current is not None and current.versions == versions:
+            return current
+
+        def model(name, model_class):
+            if current is not None and current.versions[name] == versions[name]:
+                return getattr(current, name), 0.0
+            start = time.perf_counter()
+            return self._load_model(model_class, entries[name]), (time.perf_counter() - start) * 1000
+
+        # Both model files are read and parsed in parallel
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load") as pool:
+            detection = pool.submit(model, "detection", DetectionModel)
+            classification = pool.submit(model, "classification", ClassificationModel)
+            (detection, detection_ms), (classification, classification_ms) = detection.result(), classification.result()
+        combined = CombinedModel(detection, classification, cascade=self.cascade, threshold=self.threshold)
+        load_ms = {"detection": detection_ms, "classification": classification_ms}
+        models = ModelSet(detection, classification, combined, versions, loaded_at=time.time(), load_ms=load_ms, warmup_ms=0.0)
+        if self.warmup_rows > 0:
+            start = time.perf_counter()
+            self._warm_up(models)
+            models.warmup_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            previous, self.active = self.active, models
+            if previous is not None and previous.in_flight > 0:
+                self._draining.append(previous)
+
+        # Listeners run after the swap, so what they derive from the new set is never used with the old one
+        for listener in list(self._listeners):
+            listener(models)
+        return models
+
+    def manifest_changed(self):
+        """
+        Whether the manifest changed on disk since it was last loaded.
+
+        Returns:
+            changed (bool): True if its modification time differs.
+        """
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns != self._manifest_mtime
+        except FileNotFoundError:
+            return False
+
+    def reload(self):
+        """
+        Load the manifest again and swap in the versions it now names.
+
+        Returns:
+            swapped (bool): True if other versions are now served.
+        """
+        previous = self.active
+        return self.load() is not previous
+
+    @contextmanager
+    def lease(self):
+        """
+        Pin the active models for the duration of a call.
+
+        Yields:
+            models (ModelSet): The models to score with.
+        """
+        with self._lock:
+            models = self.active
+            models.in_flight += 1
+        try:
+            yield models
+        finally:
+            with self._lock:
+                models.in_flight -= 1
+                if models.in_flight == 0 and models in self._draining:
+                    # Last call on a replaced set : drop the registry's reference to it
+                    self._draining.remove(models)
+
+    def add_listener(self, listener):
+        """
+        Register a callback run with the new ModelSet after each swap.
+
+        Args:
+            listener (Callable): The callback.
+
+        Returns:
+            None
+        """
+        self._listeners.append(listener)
+
+    def status(self):
+        """
+        Describe the served and draining versions.
+
+        Returns:
+            status (dict): The active versions, when they were loaded, the warm-up time and the calls in progress.
+        """
+        with self._lock:
+            active = self.active
+            draining = [{"versions": models.versions, "in_flight": models.in_flight} for models in self._draining]
+            in_flight = active.in_flight if active is not None else 0
+        if active is None:
+            return {"manifest": self.manifest_path, "active": None, "draining": draining, "last_error": self.last_error}
+        return {
+            "manifest": self.manifest_path,
+            "active": {
+                "versions": active.versions,
+                "paths": {"detection": active.detection.model_path, "classification": active.classification.model_path},
+                "loaded_at": active.loaded_at,
+                "load_ms": {name: round(ms, 3) for name, ms in active.load_ms.items()},
+                "warmup_ms": round(active.warmup_ms, 3),
+                "in_flight": in_flight,
+            },
+            "draining": draining,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from catboost import CatBoostClassifier
+from sklearn.metrics import f1_score, precision_score, recall_score
+from src.data.UNSW_NB15_preprocessor.Preprocessor import Preprocessor
+from src.features.UNSW_NB15_features.FeatureStore import FeatureStore
+from src.models.UNSW_NB15_models.InferenceBackend import create_backend
+from src.utils.hashing import file_digest
+from src.models.UNSW_NB15_models import train
+
+# Compaction of a trained UNSW-NB15 model : smaller variants, their accuracy and latency.
+# Run from the repository root :  python -m src.models.UNSW_NB15_models.compact classification
+#
+# Variants of the model (the active version of the manifest by default) are built by
+# keeping only the first trees of the ensemble and, given --train, by retraining it at
+# lower depths with its own learning rate and regularisation. Each variant scores the
+# evaluation flows through the serving path (FeaturePlan and inference backend) for its
+# F1, precision and recall, and is timed on batches of --batch-rows rows against the
+# current model. The Pareto front of accuracy versus latency is printed as a table, and
+# the fastest variant that loses at most --max-f1-drop of F1 is written next to the
+# model with the table in a .compaction.json.
+#
+# data/UNSW_NB15_data/test_set_labels.parquet holds the labels of the UNSW-NB15 test set
+# but not its flows. Unless --data gives flows with their labels, the variants are scored
+# on flows synthesized from the samples, as many as the test set has, against the
+# predictions of the current model : the metrics then measure how faithful a variant is.
+
+LABELS = os.path.join("data", "UNSW_NB15_data", "test_set_labels.parquet")
+TREE_FRACTIONS = [0.1, 0.2, 0.3, 0.5, 0.75]
+
+
+def evaluation_flows(task : str, data_path : str, plan, reference):
+    """
+    Read the flows the variants are scored on, and their expected predictions.
+
+    Args:
+        task (str): "detection" or "classification".
+        data_path (str): A parquet file of raw flows and their labels, or the labels of the test set only.
+        plan (FeaturePlan): The plan of the model, naming the columns it reads.
+        reference (Callable): The predictions of the current model on a dataframe of flows.
+
+    Returns:
+        df (pd.DataFrame): The raw flows.
+        y (np.ndarray): The labels, or the current model's predictions.
+        source (str): "labels" or "current model".
+    """
+    df, y = train.load_split(data_path, task)
+    if all(feature in df.columns for feature in plan.input_features):
+        return df, y.to_numpy(), "labels"
+
+    from tests.UNSW_NB15_tests.synthetic_flows import load_data
+    df = load_data(rows=len(df))
+    return df, reference(df), "current model"
+
+
+def scores(task : str, y : np.ndarray, predictions : np.ndarray):
+    """F1, precision and recall as the notebooks compute them, weighted over categories for classification."""
+    average = "binary" if task == "detection" else "weighted"
+    if task == "detection":
+        y, predictions = y.astype(int), predictions.astype(int)
+    return {
+        "f1": float(f1_score(y, predictions, average=average)),
+        "precision": float(precision_score(y, predictions, average=average, zero_division=0)),
+        "recall": float(recall_score(y, predictions, average=average, zero_division=0)),
+    }
+
+
+def truncated_variants(model : CatBoostClassifier, fractions : list):
+    """
+    Keep only the first trees of the ensemble, each tree correcting the ones before it.
+
+    Args:
+        model (CatBoostClassifier): The model.
+        fractions (list): The fractions of the trees kept.
+
+    Returns:
+        variants (dict): The variants by name.
+    """
+    variants = {}
+    for fraction in fractions:
+        trees = max(1, int(round(model.tree_count_ * fraction)))
+        if trees >= model.tree_count_:
+            continue
+        variant = model.copy()
+        variant.shrink(ntree_end=trees)
+        variants[f"trees{trees}"] = variant
+    return variants
+
+
+def lower_depth_variants(task : str, model : CatBoostClassifier, features : list, train_path : str,
+                         depths : list, store : FeatureStore, thread_count : int):
+    """
+    Retrain the model at lower depths, with its own iterations, learning rate and regularisation.
+
+    Args:
+        task (str): "detection" or "classification".
+        model (CatBoostClassifier): The model.
+        features (list): Its features.
+        train_path (str): A parquet file of raw training flows and their labels.
+        depths (list): The depths of the variants. Those not below the model's are skipped.
+        store (FeatureStore): The feature store holding the preprocessed training set.
+        thread_count (int): The number of threads CatBoost trains with.
+
+    Returns:
+        variants (dict): The variants by name.
+    """
+    all_params = model.get_all_params()
+    X, y, _ = train.split_features(store, train_path, task, features, clip=True)
+    variants = {}
+    for depth in depths:
+        if depth >= all_params["depth"]:
+            continue
+        params = {
+            "iterations": model.tree_count_,
+            "learning_rate": all_params["learning_rate"],
+            "l2_leaf_reg": all_params["l2_leaf_reg"],
+            "depth": depth,
+        }
+        start = time.perf_counter()
+        variants[f"depth{depth}"] = train.fit_model(task, params, X, y, thread_count)
+        print(f"retrained at depth {depth} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return variants
+
+
+def time_predictions(backend, plan, df : pd.DataFrame, batch_rows : int, repeats : int, thread_count : int):
+    """Median time of preparing and scoring a batch, in milliseconds."""
+    batch = df.iloc[:batch_rows]
+    num_data, cat_data = plan.transform(batch)
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.predict(backend.prepare(plan, num_data, cat_data), thread_count=thread_count)
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations)) * 1000
+
+
+def pareto_front(rows : list):
+    """Flag the variants no other one beats on both F1 and latency."""
+    for row in rows:
+        row["pareto"] = not any(
+            other["f1"] >= row["f1"] and other["latency_ms"] <= row["latency_ms"]
+            and (other["f1"] > row["f1"] or other["latency_ms"] < row["latency_ms"])
+            for other in rows
+        )
+    return rows
+
+
+def format_table(rows : list):
+    """Markdown table of the variants, fastest first."""
+    lines = [
+        "| variant | trees | depth | size (KB) | F1 | precision | recall | latency (ms) | speedup | pareto |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for row in sorted(rows, key=lambda row: row["latency_ms"]):
+        lines.append(
+            f"| {row['variant']} | {row['trees']} | {row['depth']} | {row['size_bytes'] / 1024:.0f} | {row['f1']:.4f} | "
+            f"{row['precision']:.4f} | {row['recall']:.4f} | {row['latency_ms']:.3f} | {row['speedup']:.2f}x | "
+            f"{'yes' if row['pareto'] else ''} |"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build smaller variants of a UNSW-NB15 model and report their accuracy and latency.")
+    parser.add_argument("task", choices=list(train.TASKS))
+    parser.add_argument("--manifest", default="models/UNSW_NB15_models/manifest.json")
+    parser.add_argument("--version", help="manifest version compacted, the active one by default")
+    parser.add_argument("--data", default=LABELS, help="parquet file of raw flows and their labels the variants are scored on")
+    parser.add_argument("--tree-fractions", type=float, nargs="*", default=TREE_FRACTIONS, help="fractions of the trees kept")
+    parser.add_argument("--train", help="parquet file of raw training flows, to also retrain at lower depths")
+    parser.add_argument("--depths", type=int, nargs="*", default=[4, 5, 6], help="depths of the retrained variants")
+    parser.add_argument("--feature-store", default="data/UNSW_NB15_data/feature_store", help="directory of the preprocessed frames")
+    parser.add_argument("--backend", default="catboost", help="inference backend timed : catboost or numpy")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="rows per timed batch")
+    parser.add_argument("--repeats", type=int, default=20, help="timed batches per variant, the median is reported")
+    parser.add_argument("--thread-count", type=int, default=1, help="CatBoost threads when timing")
+    parser.add_argument("--max-f1-drop", type=float, default=0.005, help="F1 a chosen variant may lose against the current model")
+    parser.add_argument("--output-dir", help="where the chosen variant and the report are written, by default next to the manifest")
+    parser.add_argument("--register", action="store_true", help="list the chosen variant in the manifest")
+    args = parser.parse_args()
+
+    version, model_path, features = train.manifest_features(args.manifest, args.task, args.version)
+    preprocessor = Preprocessor(model_path)
+    model, plan = preprocessor.model, preprocessor.plan
+
+    current = create_backend(args.backend, model)
+
+    def reference(df):
+        num_data, cat_data = plan.transform(df)
+        return current.predict(current.prepare(plan, num_data, cat_data))
+
+    df, y, source = evaluation_flows(args.task, args.data, plan, reference)
+    if args.task == "classification":
+        y = np.asarray(y).reshape(-1)
+    print(f"{version} : {model.tree_count_} trees of depth {model.get_all_params()['depth']}, "
+          f"scored on {len(df)} flows against the {source}", file=sys.stderr)
+
+    variants = {"current": model}
+    variants.update(truncated_variants(model, args.tree_fractions))
+    if args.train:
+        variants.update(lower_depth_variants(
+            args.task, model, features, args.train, args.depths, FeatureStore(args.feature_store), os.cpu_count()
+        ))
+
+    num_data, cat_data = plan.transform(df)
+    work_dir = tempfile.mkdtemp(prefix="compact_")
+    try:
+        rows = []
+        for name, variant in variants.items():
+            path = os.path.join(work_dir, f"{name}.cbm")
+            variant.save_model(path)
+            backend = create_backend(args.backend, variant)
+            predictions = backend.predict(backend.prepare(plan, num_data, cat_data), thread_count=args.thread_count)
+            if args.task == "classification":
+                predictions = predictions.reshape(-1)
+            rows.append({
+                "variant": name,
+                "trees": int(variant.tree_count_),
+                "depth": int(variant.get_all_params()["depth"]),
+                "size_bytes": os.path.getsize(path),
+                **scores(args.task, y, predictions),
+                "latency_ms": time_predictions(backend, plan, df, args.batch_rows, args.repeats, args.thread_count),
+            })
+            print(f"{name} : F1 {rows[-1]['f1']:.4f}, {rows[-1]['latency_ms']:.3f} ms", file=sys.stderr)
+
+        baseline = rows[0]
+        for row in rows:
+            row["speedup"] = baseline["latency_ms"] / row["latency_ms"]
+        pareto_front(rows)
+        print(format_table(rows))
+
+        eligible = [row for row in rows if row["f1"] >= baseline["f1"] - args.max_f1_drop]
+        chosen = min(eligible, key=lambda row: row["latency_ms"])
+        output_dir = args.output_dir or os.path.dirname(args.manifest)
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.join(output_dir, os.path.basename(model_path)[: -len(".cbm")])
+        report = {
+            "model": os.path.basename(model_path),
+            "version": version,
+            "evaluated_on": {"data": args.data, "rows": len(df), "against": source},
+            "timing": {"backend": args.backend, "batch_rows": args.batch_rows, "repeats": args.repeats, "thread_count": args.thread_count},
+            "max_f1_drop": args.max_f1_drop,
+            "chosen": chosen["variant"],
+            "variants": rows,
+        }
+        if chosen is not baseline:
+            compact_version = f"{version}_{chosen['variant']}"
+            compact_path = f"{stem}_{chosen['variant']}.cbm"
+            shutil.copyfile(os.path.join(work_dir, f"{chosen['variant']}.cbm"), compact_path)
+            report.update(compact_version=compact_version, compact_model=os.path.basename(compact_path))
+            if args.register:
+                train.register_version(args.manifest, args.task, compact_version, compact_path, file_digest(compact_path), activate=False)
+            print(f"wrote {compact_path} : {chosen['speedup']:.2f}x faster, F1 {chosen['f1'] - baseline['f1']:+.4f}", file=sys.stderr)
+        else:
+            print(f"no variant keeps F1 within {args.max_f1_drop} of {version} faster", file=sys.stderr)
+        with open(f"{stem}.compaction.json", "w") as f:
+            json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
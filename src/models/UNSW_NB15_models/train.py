@@ -0,0 +1,480 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import catboost
+import numpy as np
+import pandas as pd
+from catboost import CatBoostClassifier, Pool
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score, classification_report
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from src.data.UNSW_NB15_preprocessor.Preprocessor import Preprocessor
+from src.features.UNSW_NB15_features.FeatureStore import FeatureStore
+from src.utils.hashing import file_digest
+
+# Training of the UNSW-NB15 detection and classification models, replacing the notebooks.
+# Run from the repository root :
+#   python -m src.models.UNSW_NB15_models.train detection \
+#       --train data/UNSW_NB15_data/UNSW_NB15_training-set.parquet --test data/UNSW_NB15_data/UNSW_NB15_testing-set.parquet \
+#       --trials 16 --folds 3 --cores 16 --register
+#
+# The training and test sets are preprocessed with the Preprocessor the models serve
+# with, restricted to the features of a model version of the manifest (the active one by
+# default), and kept in the feature store : runs on the same data and features, e.g. to
+# try other search settings, memory-map them instead of preprocessing again. Every
+# (trial, fold) pair of a seeded random search is a task : the tasks run on a pool of
+# --workers processes sharing the --cores budget, each fitting CatBoost with early
+# stopping on its fold. The trial with the best mean fold score is refit on the whole
+# training set, with the mean of its folds' best iterations, and evaluated on the half
+# of the test set the notebooks report on, next to the version it replaces.
+# The model is written as <task>_model_<version>.cbm with its metrics, parameters and
+# data digests in <task>_model_<version>.json, and optionally listed in the manifest.
+
+TASKS = {
+    "detection": {
+        "target": "label",
+        "excluded": [],
+        "loss_function": "Logloss",
+        "eval_metric": "AUC",
+        "cv_metric": "auc",
+        "name_metric": "recall",
+        # The notebook's space, with the depth capped for CPU training
+        "space": {
+            "iterations": ("int", 400, 1200),
+            "learning_rate": ("float", 1e-2, 3e-1),
+            "depth": ("int", 4, 10),
+            "l2_leaf_reg": ("float", 1e-3, 10.0),
+            "bootstrap_type": ("choice", ["Bayesian", "Bernoulli", "MVS"]),
+        },
+    },
+    "classification": {
+        "target": "attack_cat",
+        # Categories too rare to learn, left out by the classification notebook
+        "excluded": ["Normal", "Analysis", "Shellcode", "Worms", "Backdoor"],
+        "loss_function": "MultiClass",
+        "eval_metric": "MultiClass",
+        "cv_metric": "f1",
+        "name_metric": "F1",
+        "space": {
+            "iterations": ("int", 800, 1200),
+            "learning_rate": ("float", 5e-2, 2e-1),
+            "depth": ("int", 4, 10),
+            "l2_leaf_reg": ("float", 1e-1, 1.0),
+        },
+    },
+}
+RANDOM_SEED = 17
+
+_task = None
+_X = None
+_y = None
+_folds = None
+_thread_count = None
+
+
+def load_split(path : str, task : str):
+    """
+    Read a UNSW-NB15 split and keep the rows the task learns from.
+
+    Args:
+        path (str): The parquet file of raw flows and their labels.
+        task (str): "detection" or "classification".
+
+    Returns:
+        df (pd.DataFrame): The raw flows.
+        y (pd.Series): Their target.
+    """
+    config = TASKS[task]
+    df = pd.read_parquet(path)
+    if config["excluded"]:
+        df = df[~df[config["target"]].isin(config["excluded"])]
+    df = df.reset_index(drop=True)
+    y = df[config["target"]]
+    if y.dtype.name == "category":
+        y = y.astype(str)
+    return df, y
+
+
+def manifest_features(manifest_path : str, task : str, version : str = None):
+    """
+    Read the feature names of a model version of the manifest.
+
+    Args:
+        manifest_path (str): The path to the manifest.
+        task (str): "detection" or "classification".
+        version (str): The version. Defaults to the active one.
+
+    Returns:
+        version (str): The version read.
+        path (str): Its model file.
+        features (list): Its feature names.
+    """
+    with open(manifest_path) as f:
+        entry = json.load(f)[task]
+    version = version or entry["active"]
+    path = os.path.join(os.path.dirname(manifest_path), entry["versions"][version]["path"])
+    return version, path, list(Preprocessor(path).selected_features)
+
+
+def build_features(df : pd.DataFrame, features : list):
+    """Compute the model features of raw flows with the serving Preprocessor."""
+    return Preprocessor(None).preprocess(df, features)
+
+
+def clip_outliers(X : pd.DataFrame, categorical_features : list, bounds : dict = None):
+    """
+    Clip the numerical features to their 0.1% and 99.9% quantiles, as the notebooks do.
+
+    Args:
+        X (pd.DataFrame): The features. It is modified in place.
+        categorical_features (list): The features left untouched.
+        bounds (dict): The bounds per feature. Defaults to the quantiles of X.
+
+    Returns:
+        bounds (dict): The bounds applied.
+    """
+    if bounds is None:
+        numerical = [column for column in X.columns if column not in categorical_features]
+        quantiles = X[numerical].quantile([0.001, 0.999])
+        bounds = {column: (float(quantiles.at[0.001, column]), float(quantiles.at[0.999, column])) for column in numerical}
+    for column, (lower, upper) in bounds.items():
+        X[column] = X[column].clip(lower, upper)
+    return bounds
+
+
+def sample_params(task : str, trials : int, seed : int):
+    """
+    Draw the hyperparameters of a random search, the same ones for the same seed.
+
+    Args:
+        task (str): "detection" or "classification".
+        trials (int): The number of trials.
+        seed (int): The seed of the search.
+
+    Returns:
+        params (list): One dict of hyperparameters per trial.
+    """
+    rng = np.random.default_rng(seed)
+    trials_params = []
+    for _ in range(trials):
+        params = {}
+        for name, (kind, *values) in TASKS[task]["space"].items():
+            if kind == "int":
+                params[name] = int(rng.integers(values[0], values[1] + 1))
+            elif kind == "float":
+                params[name] = float(rng.uniform(values[0], values[1]))
+            else:
+                params[name] = str(rng.choice(values[0]))
+        # The bootstrap's own parameter, as in the detection notebook
+        if params.get("bootstrap_type") == "Bayesian":
+            params["bagging_temperature"] = float(rng.uniform(0, 10))
+        elif params.get("bootstrap_type") == "Bernoulli":
+            params["subsample"] = float(rng.uniform(0.5, 1))
+        trials_params.append(params)
+    return trials_params
+
+
+def class_weights(task : str, y : pd.Series):
+    """Weights balancing the classes, as in the notebooks."""
+    counts = y.value_counts()
+    if task == "detection":
+        return {0: 1.0, 1: float(counts.get(0, 0) / counts.get(1, 1))}
+    return {label: float(len(y) / count) for label, count in counts.items()}
+
+
+def fit_model(task : str, params : dict, X : pd.DataFrame, y : pd.Series, thread_count : int,
+              eval_set : tuple = None, early_stopping_rounds : int = None):
+    """
+    Fit a CatBoost model of the task.
+
+    Args:
+        task (str): "detection" or "classification".
+        params (dict): The hyperparameters.
+        X (pd.DataFrame): The features.
+        y (pd.Series): The target.
+        thread_count (int): The number of threads CatBoost uses.
+        eval_set (tuple): Validation features and target, for early stopping.
+        early_stopping_rounds (int): Stop after this many iterations without improvement on eval_set.
+
+    Returns:
+        model (CatBoostClassifier): The fitted model.
+    """
+    config = TASKS[task]
+    categorical_features = [column for column in X.columns if column in Preprocessor(None).categorical_features]
+    model = CatBoostClassifier(
+        **params,
+        loss_function=config["loss_function"],
+        eval_metric=config["eval_metric"],
+        class_weights=class_weights(task, y),
+        random_seed=RANDOM_SEED,
+        thread_count=thread_count,
+        allow_writing_files=False,
+        verbose=False,
+    )
+    train_pool = Pool(X, y, cat_features=categorical_features)
+    eval_pool = Pool(eval_set[0], eval_set[1], cat_features=categorical_features) if eval_set is not None else None
+    model.fit(train_pool, eval_set=eval_pool, early_stopping_rounds=early_stopping_rounds)
+    return model
+
+
+def evaluate(task : str, model : CatBoostClassifier, X : pd.DataFrame, y : pd.Series, thread_count : int = -1):
+    """
+    Compute the metrics the notebooks report.
+
+    Args:
+        task (str): "detection" or "classification".
+        model (CatBoostClassifier): The model.
+        X (pd.DataFrame): The features the model reads.
+        y (pd.Series): The target.
+        thread_count (int): The number of threads CatBoost uses.
+
+    Returns:
+        metrics (dict): F1, precision and recall, plus AUC for detection and the per-category report for classification.
+    """
+    predictions = model.predict(X, thread_count=thread_count)
+    if task == "detection":
+        predictions = predictions.astype(int)
+        probabilities = model.predict_proba(X, thread_count=thread_count)[:, 1]
+        return {
+            "f1": float(f1_score(y, predictions)),
+            "precision": float(precision_score(y, predictions)),
+            "recall": float(recall_score(y, predictions)),
+            "auc": float(roc_auc_score(y, probabilities)),
+        }
+    predictions = predictions[:, 0]
+    return {
+        "f1": float(f1_score(y, predictions, average="weighted")),
+        "precision": float(precision_score(y, predictions, average="weighted", zero_division=0)),
+        "recall": float(recall_score(y, predictions, average="weighted")),
+        "report": classification_report(y, predictions, output_dict=True, zero_division=0),
+    }
+
+
+def split_features(store : FeatureStore, path : str, task : str, features : list, clip : bool):
+    """
+    Read the features and target of a split from the feature store, preprocessing it on a miss.
+
+    Args:
+        store (FeatureStore): The feature store.
+        path (str): The parquet file of raw flows and their labels.
+        task (str): "detection" or "classification".
+        features (list): The features computed.
+        clip (bool): Clip the numerical features to their own quantiles, for a training set.
+
+    Returns:
+        X (pd.DataFrame): The features.
+        y (pd.Series): The target.
+        key (str): The key of the frame in the store.
+    """
+    def build():
+        df, y = load_split(path, task)
+        X = build_features(df, features)
+        if clip:
+            clip_outliers(X, [column for column in features if column in Preprocessor(None).categorical_features])
+        return X.assign(__target=y.to_numpy())
+
+    config = TASKS[task]
+    df, key = store.get_or_build(
+        [path], features, build, target=config["target"], excluded=config["excluded"], clip=clip,
+    )
+    # pop keeps the features the memory-mapped columns of the store, drop would copy them
+    y = df.pop("__target")
+    return df, y, key
+
+
+def _init_worker(task : str, store_directory : str, key : str, folds : np.ndarray, thread_count : int):
+    """Memory-map the preprocessed training set once per worker process."""
+    global _task, _X, _y, _folds, _thread_count
+    _task = task
+    _thread_count = thread_count
+    df = FeatureStore(store_directory).load(key)
+    _y = df.pop("__target")
+    _X = df
+    _folds = folds
+
+
+def fit_fold(trial : int, params : dict, fold : int, early_stopping_rounds : int):
+    """
+    Fit the parameters of a trial on all folds but one and score them on that fold.
+
+    Args:
+        trial (int): The trial number.
+        params (dict): The hyperparameters of the trial.
+        fold (int): The fold held out.
+        early_stopping_rounds (int): Stop after this many iterations without improvement on the fold.
+
+    Returns:
+        result (dict): The trial, fold, score, best iteration and fit time.
+    """
+    start = time.perf_counter()
+    train, held_out = _folds != fold, _folds == fold
+    X_val, y_val = _X[held_out], _y[held_out]
+    model = fit_model(
+        _task, params, _X[train], _y[train], _thread_count,
+        eval_set=(X_val, y_val), early_stopping_rounds=early_stopping_rounds,
+    )
+    score = evaluate(_task, model, X_val, y_val, thread_count=_thread_count)[TASKS[_task]["cv_metric"]]
+    return {
+        "trial": trial,
+        "fold": fold,
+        "score": score,
+        "best_iteration": int(model.get_best_iteration()),
+        "fit_s": time.perf_counter() - start,
+    }
+
+
+def register_version(manifest_path : str, task : str, version : str, model_path : str, sha256 : str, activate : bool):
+    """
+    List a model version in the manifest, atomically, so a serving registry never reads half a file.
+
+    Args:
+        manifest_path (str): The path to the manifest.
+        task (str): "detection" or "classification".
+        version (str): The version.
+        model_path (str): The model file.
+        sha256 (str): Its sha256 hex digest.
+        activate (bool): Make it the active version.
+
+    Returns:
+        None
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    relative_path = os.path.relpath(model_path, os.path.dirname(manifest_path))
+    manifest[task]["versions"][version] = {"path": relative_path, "sha256": sha256}
+    if activate:
+        manifest[task]["active"] = version
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a UNSW-NB15 model with a parallel cross-validated hyperparameter search.")
+    parser.add_argument("task", choices=list(TASKS))
+    parser.add_argument("--train", required=True, help="parquet file of the raw training flows and their labels")
+    parser.add_argument("--test", required=True, help="parquet file of the raw test flows and their labels")
+    parser.add_argument("--manifest", default="models/UNSW_NB15_models/manifest.json")
+    parser.add_argument("--features-from", help="manifest version whose features are learnt, the active one by default")
+    parser.add_argument("--trials", type=int, default=16, help="number of hyperparameter sets drawn")
+    parser.add_argument("--folds", type=int, default=3, help="number of cross-validation folds")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="seed of the search and of the folds")
+    parser.add_argument("--early-stopping-rounds", type=int, default=100)
+    parser.add_argument("--feature-store", default="data/UNSW_NB15_data/feature_store", help="directory of the preprocessed frames")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="cores shared by the workers")
+    parser.add_argument("--workers", type=int, help="number of worker processes, by default one per core up to the number of tasks")
+    parser.add_argument("--version", help="version name, by default <test score>_<metric>_<date>")
+    parser.add_argument("--output-dir", help="where the model and its metrics are written, by default next to the manifest")
+    parser.add_argument("--register", action="store_true", help="list the new version in the manifest")
+    parser.add_argument("--activate", action="store_true", help="list the new version in the manifest and make it active")
+    args = parser.parse_args()
+
+    config = TASKS[args.task]
+    tasks_count = args.trials * args.folds
+    workers = args.workers or max(1, min(args.cores, tasks_count))
+    thread_count = max(1, args.cores // workers)
+    timings = {}
+
+    start = time.perf_counter()
+    store = FeatureStore(args.feature_store)
+    base_version, base_path, features = manifest_features(args.manifest, args.task, args.features_from)
+    X_train, y_train, train_key = split_features(store, args.train, args.task, features, clip=True)
+    X_test, y_test, test_key = split_features(store, args.test, args.task, features, clip=False)
+    folds = np.empty(len(y_train), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+    for fold, (_, held_out) in enumerate(splitter.split(np.zeros(len(y_train)), y_train)):
+        folds[held_out] = fold
+    timings["preprocess_s"] = time.perf_counter() - start
+    print(f"{args.task} : {len(y_train)} training rows, {len(features)} features of {base_version}, "
+          f"{store.hits} of 2 splits read from the feature store", file=sys.stderr)
+
+    # The workers memory-map the preprocessed training set instead of preprocessing it again
+    start = time.perf_counter()
+    trials = sample_params(args.task, args.trials, args.seed)
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(args.task, store.directory, train_key, folds, thread_count)
+    ) as executor:
+        futures = [
+            executor.submit(fit_fold, trial, params, fold, args.early_stopping_rounds)
+            for trial, params in enumerate(trials) for fold in range(args.folds)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            print(f"[{done}/{tasks_count}] trial {result['trial']} fold {result['fold']} : "
+                  f"{config['cv_metric']} {result['score']:.4f} in {result['fit_s']:.1f} s", file=sys.stderr)
+    timings["search_s"] = time.perf_counter() - start
+
+    search = []
+    for trial, params in enumerate(trials):
+        trial_results = sorted((result for result in results if result["trial"] == trial), key=lambda result: result["fold"])
+        scores = [result["score"] for result in trial_results]
+        search.append({
+            "trial": trial,
+            "params": params,
+            "scores": scores,
+            "mean": float(np.mean(scores)),
+            "std": float(np.std(scores)),
+            "best_iterations": [result["best_iteration"] for result in trial_results],
+        })
+    best = max(search, key=lambda trial: trial["mean"])
+    # The folds stopped at their best iteration, the refit on all rows runs as many
+    params = dict(best["params"], iterations=max(1, int(round(np.mean(best["best_iterations"]) + 1))))
+    print(f"best trial {best['trial']} : {config['cv_metric']} {best['mean']:.4f} ± {best['std']:.4f}, {params}", file=sys.stderr)
+
+    start = time.perf_counter()
+    model = fit_model(args.task, params, X_train, y_train, args.cores)
+    timings["final_fit_s"] = time.perf_counter() - start
+
+    # The notebooks hold out half of the test set, the other half validating
+    start = time.perf_counter()
+    X_test, _, y_test, _ = train_test_split(X_test, y_test, test_size=0.5, random_state=RANDOM_SEED)
+    test_metrics = evaluate(args.task, model, X_test, y_test, thread_count=args.cores)
+    # The features are those of the replaced version, it reads the same frame
+    base_metrics = evaluate(args.task, Preprocessor(base_path).model, X_test, y_test, thread_count=args.cores)
+    timings["evaluate_s"] = time.perf_counter() - start
+
+    version = args.version or f"{round(test_metrics[config['name_metric'].lower()] * 100)}_{config['name_metric']}_{time.strftime('%Y%m%d%H%M')}"
+    output_dir = args.output_dir or os.path.dirname(args.manifest)
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, f"{args.task}_model_{version}.cbm")
+    if os.path.exists(model_path):
+        parser.error(f"{model_path} already exists, choose another --version")
+    model.save_model(model_path)
+    sha256 = file_digest(model_path)
+
+    report = {
+        "task": args.task,
+        "version": version,
+        "model": os.path.basename(model_path),
+        "sha256": sha256,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "features": features,
+        "features_from": base_version,
+        "params": params,
+        "search": {"metric": config["cv_metric"], "folds": args.folds, "seed": args.seed, "best_trial": best["trial"], "trials": search},
+        "test": test_metrics,
+        "baseline": {"version": base_version, "test": base_metrics},
+        "data": {
+            "train": {"path": args.train, "rows": len(y_train), "sha256": file_digest(args.train), "feature_key": train_key},
+            "test": {"path": args.test, "rows": len(y_test), "sha256": file_digest(args.test), "feature_key": test_key},
+        },
+        "environment": {"catboost": catboost.__version__, "cores": args.cores, "workers": workers, "thread_count": thread_count},
+        "timings_s": {name: round(seconds, 3) for name, seconds in timings.items()},
+    }
+    with open(model_path[: -len(".cbm")] + ".json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.register or args.activate:
+        register_version(args.manifest, args.task, version, model_path, sha256, args.activate)
+    print(f"wrote {model_path} : test {config['cv_metric']} {test_metrics[config['cv_metric']]:.4f} "
+          f"(baseline {base_version} {base_metrics[config['cv_metric']]:.4f})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
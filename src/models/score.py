@@ -0,0 +1,217 @@
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bulk scoring of parquet files, without the API.
+# Run from the repository root :  python -m src.models.score data/captures/ --workers 8
+#
+# Each row group of each input file is a task. Tasks are spread over a process pool
+# whose workers load the models once, read their row group in batches of at most
+# --batch-rows rows and write the predictions to a part file. Once every part of an
+# input is done they are concatenated into <input>.predictions.parquet. Part files
+# are written atomically, so an interrupted run resumes with the missing parts only.
+
+OUTPUT_SUFFIX = ".predictions.parquet"
+PARTS_SUFFIX = ".predictions.parts"
+
+_model = None
+_mode = None
+_thread_count = None
+_loaded = None
+
+
+def _init_worker(mode : str, backend : str, threshold : float, thread_count : int):
+    """Load the models once per worker process."""
+    global _model, _mode, _thread_count, _loaded
+    _mode = mode
+    _thread_count = thread_count
+    if _loaded == (mode, backend, threshold):
+        # Forked from a process that already loaded them : share its copy
+        return
+
+    from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+    from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+    from src.models.UNSW_NB15_models.CombinedModel import CombinedModel
+
+    if mode == "detection":
+        _model = DetectionModel(backend=backend)
+    elif mode == "classification":
+        _model = ClassificationModel(backend=backend)
+    else:
+        _model = CombinedModel(
+            DetectionModel(backend=backend), ClassificationModel(backend=backend), cascade=True, threshold=threshold
+        )
+    _loaded = (mode, backend, threshold)
+
+
+def input_columns(mode : str, backend : str = "catboost", threshold : float = None):
+    """Load the models of a mode in this process and return the raw columns they read, to decode nothing else."""
+    _init_worker(mode, backend, threshold, 1)
+    plan = _model.plan if mode == "all" else _model.preprocessor.plan
+    return list(plan.input_features)
+
+
+def _predictions_table(batch : pa.RecordBatch, keep : list):
+    df = batch.to_pandas()
+    if _mode == "detection":
+        columns = {"prediction": _model.predict(df, thread_count=_thread_count)}
+    elif _mode == "classification":
+        columns = {"attack_cat": _model.predict(df, thread_count=_thread_count)[:, 0]}
+    else:
+        detection, categories = _model.predict(df, thread_count=_thread_count)
+        columns = {"prediction": detection, "attack_cat": categories[:, 0]}
+
+    arrays = {name: batch.column(name) for name in keep}
+    for name, values in columns.items():
+        arrays[name] = pa.array(values, type=pa.string() if values.dtype == object else None)
+    return pa.table(arrays)
+
+
+def score_row_group(path : str, row_group : int, part_path : str, columns : list, keep : list, batch_rows : int):
+    """
+    Score one row group of a parquet file into a part file.
+
+    Args:
+        path (str): The input parquet file.
+        row_group (int): The row group to score.
+        part_path (str): The part file to write.
+        columns (list): The columns to decode.
+        keep (list): The input columns copied to the output next to the predictions.
+        batch_rows (int): The maximum number of rows decoded and scored at once.
+
+    Returns:
+        rows (int): The number of rows scored.
+    """
+    parquet_file = pq.ParquetFile(path)
+    tmp_path = part_path + ".tmp"
+    rows = 0
+    writer = None
+    try:
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, row_groups=[row_group], columns=columns):
+            table = _predictions_table(batch, keep)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            rows += len(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # Empty row group : still record it as done
+        empty = pa.RecordBatch.from_pylist([], schema=parquet_file.schema_arrow).select(columns)
+        pq.write_table(_predictions_table(empty, keep), tmp_path)
+    os.replace(tmp_path, part_path)
+    return rows
+
+
+def list_inputs(paths : list):
+    """Expand the input files and directories into the parquet files to score, skipping outputs."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True))
+        else:
+            candidates = [path]
+        files += [f for f in candidates if not f.endswith(OUTPUT_SUFFIX) and PARTS_SUFFIX not in f]
+    return files
+
+
+def output_path(path : str, output_dir : str = None):
+    name = os.path.basename(path)[: -len(".parquet")] if path.endswith(".parquet") else os.path.basename(path)
+    return os.path.join(output_dir or os.path.dirname(path), name + OUTPUT_SUFFIX)
+
+
+def merge_parts(parts : list, output : str):
+    """Concatenate the part files, in row group order, into the output file. Returns False when there is none."""
+    tmp_output = output + ".tmp"
+    writer = None
+    for part in parts:
+        part_file = pq.ParquetFile(part)
+        if writer is None:
+            writer = pq.ParquetWriter(tmp_output, part_file.schema_arrow)
+        for row_group in range(part_file.num_row_groups):
+            writer.write_table(part_file.read_row_group(row_group))
+    if writer is None:
+        return False
+    writer.close()
+    os.replace(tmp_output, output)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score parquet files of raw flows with the UNSW-NB15 models.")
+    parser.add_argument("inputs", nargs="+", help="parquet files or directories of parquet files")
+    parser.add_argument("--mode", choices=["all", "detection", "classification"], default="all",
+                        help="all : detection and attack category of the flagged rows")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--thread-count", type=int, default=1, help="CatBoost threads per worker")
+    parser.add_argument("--batch-rows", type=int, default=65536, help="maximum rows decoded and scored at once per worker")
+    parser.add_argument("--backend", default="catboost", help="inference backend : catboost or numpy")
+    parser.add_argument("--threshold", type=float, help="detection probability from which a flow is flagged (mode all)")
+    parser.add_argument("--keep-columns", nargs="*", default=[], help="input columns copied to the output, e.g. an id")
+    parser.add_argument("--output-dir", help="write the outputs here instead of next to the inputs")
+    parser.add_argument("--overwrite", action="store_true", help="score inputs whose output already exists")
+    args = parser.parse_args()
+
+    files = list_inputs(args.inputs)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    columns = list(dict.fromkeys(input_columns(args.mode, args.backend, args.threshold) + args.keep_columns))
+
+    # One task per row group that has no part file yet
+    pending = {}
+    tasks = []
+    for path in files:
+        output = output_path(path, args.output_dir)
+        if os.path.exists(output) and not args.overwrite:
+            print(f"{path} : already scored, skipping", file=sys.stderr)
+            continue
+        parts_dir = output[: -len(OUTPUT_SUFFIX)] + PARTS_SUFFIX
+        if os.path.exists(output):
+            # --overwrite : parts left from an older run may come from other models
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir, exist_ok=True)
+        parts = [os.path.join(parts_dir, f"{row_group:06d}.parquet") for row_group in range(pq.ParquetFile(path).num_row_groups)]
+        todo = [(row_group, part) for row_group, part in enumerate(parts) if not os.path.exists(part)]
+        if len(todo) < len(parts):
+            print(f"{path} : resuming, {len(parts) - len(todo)}/{len(parts)} row groups already scored", file=sys.stderr)
+        pending[path] = {"output": output, "parts_dir": parts_dir, "parts": parts, "remaining": len(todo)}
+        tasks += [(path, row_group, part) for row_group, part in todo]
+
+    def finish(path):
+        entry = pending[path]
+        written = merge_parts(entry["parts"], entry["output"])
+        shutil.rmtree(entry["parts_dir"], ignore_errors=True)
+        print(f"{path} : " + (f"wrote {entry['output']}" if written else "no row groups, nothing to write"), file=sys.stderr)
+
+    for path, entry in pending.items():
+        if entry["remaining"] == 0:
+            finish(path)
+
+    start = time.perf_counter()
+    rows = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(args.mode, args.backend, args.threshold, args.thread_count)
+    ) as executor:
+        futures = {
+            executor.submit(score_row_group, path, row_group, part, columns, args.keep_columns, args.batch_rows): path
+            for path, row_group, part in tasks
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            rows += future.result()
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{len(tasks)}] {rows} rows, {rows / elapsed:.0f} rows/s", file=sys.stderr)
+            pending[path]["remaining"] -= 1
+            if pending[path]["remaining"] == 0:
+                finish(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import hashlib
+
+
+def file_digest(path : str):
+    """
+    Return the sha256 hex digest of a file, read in blocks of 1 MiB.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        digest (str): The sha256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,63 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+# Functions called with (stage, seconds, model, rows) after each timed stage
+_observers: List[Callable[[str, float, str, int], None]] = []
+
+
+def add_observer(observer : Callable[[str, float, str, int], None]):
+    """
+    Register a function receiving the duration of every timed stage.
+
+    Args:
+        observer (Callable): Called with the stage name, its duration in seconds,
+            the model name ("" outside of a model) and the number of rows processed.
+
+    Returns:
+        None
+    """
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer : Callable[[str, float, str, int], None]):
+    """
+    Unregister a function added with add_observer.
+
+    Args:
+        observer (Callable): The registered function.
+
+    Returns:
+        None
+    """
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+@contextmanager
+def stage(name : str, model : str = "", rows : int = 0):
+    """
+    Time the enclosed block and report it to the registered observers.
+
+    Nothing is measured while no observer is registered.
+
+    Args:
+        name (str): The stage name, e.g. "preprocess.numerical" or "predict".
+        model (str): The model running the stage, if any.
+        rows (int): The number of rows processed by the stage.
+
+    Returns:
+        None
+    """
+    if not _observers:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for observer in _observers:
+            observer(name, elapsed, model, rows)
@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+import catboost
+import numpy as np
+import pandas as pd
+from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from tests.UNSW_NB15_tests.synthetic_flows import load_data
+
+warnings.filterwarnings("ignore")
+
+# In-process benchmark of the preprocessing and the models, no server needed.
+# Run from the repository root :  python -m tests.UNSW_NB15_tests.benchmark --save baseline.json
+# then later                   :  python -m tests.UNSW_NB15_tests.benchmark --baseline baseline.json
+
+
+def build_cases(backend):
+    """Return the benchmarked functions, each taking a DataFrame of raw flows."""
+    detection_model = DetectionModel(backend=backend)
+    classification_model = ClassificationModel(backend=backend)
+    preprocessor = detection_model.preprocessor
+
+    return {
+        "Preprocessor.preprocess": (lambda df: df, preprocessor.preprocess),
+        "Preprocessor.create_pool": (preprocessor.preprocess, preprocessor.create_pool),
+        "FeaturePlan.transform": (lambda df: df, preprocessor.plan.transform),
+        "FeaturePlan.create_pool": (lambda df: df, preprocessor.plan.create_pool),
+        "DetectionModel.predict": (lambda df: df, detection_model.predict),
+        "DetectionModel.predict_proba": (lambda df: df, detection_model.predict_proba),
+        "ClassificationModel.predict": (lambda df: df, classification_model.predict),
+    }
+
+
+def run_case(setup, func, df, min_repeats, max_repeats, min_time):
+    """Time func on the prepared input until both min_repeats and min_time are reached."""
+    data = setup(df)
+    func(data)  # warm-up
+
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < max_repeats and (len(durations) < min_repeats or time.perf_counter() - start < min_time):
+        call_start = time.perf_counter()
+        func(data)
+        durations.append(time.perf_counter() - call_start)
+
+    # Peak of the Python-level allocations (numpy and pandas included, CatBoost's C++ heap excluded)
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations = np.array(durations)
+    return {
+        "rows": len(df),
+        "repeats": len(durations),
+        "p50_ms": round(float(np.percentile(durations, 50)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(durations, 99)) * 1000, 4),
+        "mean_ms": round(float(durations.mean()) * 1000, 4),
+        "rows_per_s": round(len(df) / float(durations.mean()), 1),
+        "peak_traced_mib": round(peak / 2**20, 3),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Flag the cases whose p50 latency grew by more than tolerance over the baseline."""
+    previous = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    comparisons = []
+    for result in results:
+        reference = previous.get((result["case"], result["rows"]))
+        if reference is None:
+            continue
+        ratio = result["p50_ms"] / reference["p50_ms"] if reference["p50_ms"] else float("inf")
+        comparisons.append({
+            "case": result["case"],
+            "rows": result["rows"],
+            "baseline_p50_ms": reference["p50_ms"],
+            "p50_ms": result["p50_ms"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance,
+        })
+    return comparisons
+
+
+def environment(backend):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "catboost": catboost.__version__,
+        "backend": backend,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Preprocessor and the models in-process.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 1000, 100000])
+    parser.add_argument("--cases", nargs="+", help="benchmark only these cases, e.g. DetectionModel.predict")
+    parser.add_argument("--backend", default="catboost", help="inference backend of the models: catboost or numpy")
+    parser.add_argument("--data", help="parquet file with the raw model input columns, instead of synthesized flows")
+    parser.add_argument("--min-repeats", type=int, default=5)
+    parser.add_argument("--max-repeats", type=int, default=1000)
+    parser.add_argument("--min-time", type=float, default=1.0, help="minimum seconds spent timing each case and batch size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file, e.g. to use them as a baseline")
+    parser.add_argument("--baseline", help="JSON file written by --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown over the baseline, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    cases = build_cases(args.backend)
+    if args.cases:
+        cases = {name: cases[name] for name in args.cases}
+
+    data = load_data(args.data, max(args.batch_sizes), args.seed)
+    results = []
+    for name, (setup, func) in cases.items():
+        for batch_size in args.batch_sizes:
+            result = run_case(setup, func, data.iloc[:batch_size], args.min_repeats, args.max_repeats, args.min_time)
+            results.append({"case": name, **result})
+            print(f"{name:<30} {result['rows']:>7} rows  p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms", file=sys.stderr)
+
+    report = {"environment": environment(args.backend), "results": results}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_to_baseline(results, json.load(f), args.tolerance)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if any(comparison["regression"] for comparison in report.get("comparison", [])):
+        print("Regressions over the baseline : " + ", ".join(
+            f"{c['case']} ({c['rows']} rows, x{c['ratio']})" for c in report["comparison"] if c["regression"]
+        ), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import time
+import warnings
+import numpy as np
+from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from tests.UNSW_NB15_tests.synthetic_flows import load_data
+
+warnings.filterwarnings("ignore")
+
+# Check that the catboost and numpy inference backends agree, and time them.
+# Run from the repository root :  python -m tests.UNSW_NB15_tests.compare_backends
+
+
+def time_call(func, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def compare(model_class, df, batch_sizes, repeats):
+    models = {backend: model_class(backend=backend) for backend in ("catboost", "numpy")}
+    reference, candidate = models["catboost"], models["numpy"]
+
+    report = {
+        "model": model_class.__name__,
+        "rows": len(df),
+        "prediction_agreement": float(np.mean(reference.predict(df) == candidate.predict(df))),
+        "max_proba_diff": float(np.max(np.abs(reference.predict_proba(df) - candidate.predict_proba(df)))),
+        "timings": [],
+    }
+    for batch_size in batch_sizes:
+        batch = df.iloc[:batch_size]
+        timing = {"batch_size": len(batch)}
+        for backend, model in models.items():
+            seconds = time_call(lambda: model.predict(batch), repeats)
+            timing[f"{backend}_ms"] = round(seconds * 1000, 3)
+            timing[f"{backend}_rows_per_s"] = round(len(batch) / seconds)
+        report["timings"].append(timing)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the catboost and numpy inference backends.")
+    parser.add_argument("--data", help="parquet file with the raw model input columns")
+    parser.add_argument("--rows", type=int, help="rows to synthesize when --data is not given (default: size of the test set)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_data(args.data, args.rows, args.seed)
+    reports = [compare(model_class, df, args.batch_sizes, args.repeats) for model_class in (DetectionModel, ClassificationModel)]
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from src.features.UNSW_NB15_features.ConnectionCounter import ConnectionCounter
+from tests.UNSW_NB15_tests.synthetic_flows import load_data
+
+warnings.filterwarnings("ignore")
+
+# Check the connection-count engine against a brute-force recount of each window, with the
+# flows fed in batches so that the windows span batch boundaries, and time the engine.
+# Run from the repository root :  python -m tests.UNSW_NB15_tests.compare_connection_counts
+
+
+def add_endpoints(df, hosts, ports, seed):
+    """Give the flows addresses and ports drawn from small pools, so that keys repeat within a window."""
+    rng = np.random.default_rng(seed)
+    return df.assign(
+        srcip=[f"10.0.0.{i}" for i in rng.integers(0, hosts, len(df))],
+        dstip=[f"10.0.1.{i}" for i in rng.integers(0, hosts, len(df))],
+        sport=rng.integers(1024, 1024 + ports, len(df)),
+        dsport=rng.choice([21, 22, 53, 80, 111, 443, 8080][:ports], len(df)),
+    )
+
+
+def brute_force(df, key_columns, window):
+    """Count, for each flow, the flows among the last `window` (itself included) with the same key."""
+    codes = df.groupby(key_columns, sort=False, observed=True).ngroup().to_numpy()
+    counts = np.ones(len(codes), dtype=np.int64)
+    for lag in range(1, window):
+        counts[lag:] += codes[lag:] == codes[:-lag]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the connection-count engine with a brute-force recount.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[7, 1000, 65536], help="batch sizes the flows are fed in")
+    parser.add_argument("--hosts", type=int, default=20, help="distinct source and destination addresses")
+    parser.add_argument("--ports", type=int, default=5, help="distinct source and destination ports")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = add_endpoints(load_data(rows=args.rows, seed=args.seed), args.hosts, args.ports, args.seed)
+    engine = ConnectionCounter()
+    expected = {feature: brute_force(df, columns, engine.window) for feature, columns in engine.features.items()}
+
+    reports = []
+    for batch_rows in args.batch_rows:
+        engine.reset()
+        start = time.perf_counter()
+        parts = [engine.transform(df.iloc[offset:offset + batch_rows]) for offset in range(0, len(df), batch_rows)]
+        seconds = time.perf_counter() - start
+        counted = pd.concat(parts, ignore_index=True)
+        mismatches = {feature: int(np.sum(counted[feature].to_numpy() != counts)) for feature, counts in expected.items()}
+        reports.append({
+            "batch_rows": batch_rows,
+            "rows": len(df),
+            "mismatches": mismatches,
+            "flows_per_s": round(len(df) / seconds),
+        })
+    print(json.dumps(reports, indent=2))
+    if any(any(report["mismatches"].values()) for report in reports):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
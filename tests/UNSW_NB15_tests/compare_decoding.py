@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import warnings
+import numpy as np
+import pyarrow.parquet as pq
+from api_src.services.streaming import iter_batches, open_parquet
+from src.models.UNSW_NB15_models.DetectionModel import DetectionModel
+from src.models.UNSW_NB15_models.ClassificationModel import ClassificationModel
+from tests.UNSW_NB15_tests.synthetic_flows import load_data
+
+warnings.filterwarnings("ignore")
+
+# Check that decoding only a plan's input columns, as float32 and dictionaries, gives the
+# same feature matrices as decoding the whole upload. Integer columns read as float32 get
+# values above 2**24, which float32 cannot hold exactly.
+# Run from the repository root :  python -m tests.UNSW_NB15_tests.compare_decoding
+
+
+class _Upload:
+    # The part of an UploadFile open_parquet reads
+    def __init__(self, file):
+        self.file = file
+
+
+def compare(model_class, df, path, batch_rows):
+    plan = model_class().preprocessor.plan
+    num_reference, cat_reference = plan.transform(df)
+
+    with open(path, "rb") as f:
+        parquet_file = open_parquet(_Upload(f), plan=plan)
+        chunks = [plan.transform(chunk) for chunk in iter_batches(parquet_file, batch_rows, plan)]
+    num_data = np.concatenate([num for num, _ in chunks])
+    cat_data = np.concatenate([cat for _, cat in chunks])
+
+    identical = np.array_equal(num_data, num_reference, equal_nan=True) and np.array_equal(cat_data, cat_reference)
+    print(f"{model_class.__name__} : {len(df)} rows, feature matrices {'identical' if identical else 'DIFFER'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the plan-driven parquet decoding with a full decode.")
+    parser.add_argument("--data", help="parquet file with the raw model input columns")
+    parser.add_argument("--rows", type=int, default=10000, help="rows to synthesize when --data is not given")
+    parser.add_argument("--batch-rows", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_data(args.data, args.rows, args.seed)
+    # Integers float32 rounds : 2**24 + 1 is the first one
+    for column in df.select_dtypes("integer").columns:
+        df[column] = df[column].astype(np.int64)
+        df.loc[df.index[::97], column] = 2**24 + 1
+        df.loc[df.index[1::97], column] = 2**31 + 3
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flows.parquet")
+        df.to_parquet(path, row_group_size=args.batch_rows * 2)
+        df = pq.read_table(path).to_pandas()
+        results = [compare(model_class, df, path, args.batch_rows) for model_class in (DetectionModel, ClassificationModel)]
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
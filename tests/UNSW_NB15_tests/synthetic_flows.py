@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Raw flows used to synthesize benchmark and comparison inputs
+
+SAMPLES = [
+    os.path.join("tests", "UNSW_NB15_tests", "10_samples.parquet"),
+    os.path.join("tests", "UNSW_NB15_tests", "10_attack_cat_samples.parquet"),
+]
+LABELS = os.path.join("data", "UNSW_NB15_data", "test_set_labels.parquet")
+
+
+def load_data(data_path=None, rows=None, seed=0):
+    """Load the features to score.
+
+    test_set_labels.parquet only holds the labels of the UNSW-NB15 test set, so unless a
+    features file is given, the sample flows are resampled to as many rows as the test set
+    and their numerical columns jittered so that the trees see varied values.
+    """
+    if data_path:
+        return pd.read_parquet(data_path)
+
+    if rows is None:
+        rows = len(pd.read_parquet(LABELS))
+    samples = pd.concat([pd.read_parquet(path) for path in SAMPLES], ignore_index=True)
+    df = samples.sample(rows, replace=True, random_state=seed).reset_index(drop=True)
+
+    rng = np.random.default_rng(seed)
+    for column in df.select_dtypes("number").columns:
+        jittered = df[column] * rng.lognormal(0, 1, len(df))
+        df[column] = jittered.round().astype(df[column].dtype) if df[column].dtype.kind == "i" else jittered.astype(df[column].dtype)
+    return df